@@ -0,0 +1,222 @@
+# apps/agent/agent_memory.py
+"""
+Agent 메모리
+사용자/세션별로 과거 인사이트를 저장하고, 크기 제한(LRU/TTL)과
+로컬 역색인을 이용해 현재 작업과 관련된 상위 k개만 프롬프트에 넣는다.
+
+메모리는 프로세스(워커) 안에만 있다. AGENT_WORKERS > 1 이면 요청을 받은 워커가
+기억하는 것만 떠올리므로, 세션 메모리가 중요하면 단일 워커로 실행하거나
+로드밸런서에서 세션 고정(sticky session)을 사용한다.
+"""
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+import itertools
+import math
+import os
+import re
+import threading
+import time
+
+
+_WORD_PATTERN = re.compile(r"[0-9A-Za-z가-힣]+")
+
+
+def tokenize(text: str) -> Counter:
+    """
+    검색용 토큰 (소문자 단어 + 한글 음절 bigram)
+
+    형태소 분석기 없이도 "카페지출"과 "카페 지출"이 서로 매칭되도록 bigram을 함께 쓴다.
+    """
+    tokens: Counter = Counter()
+    for word in _WORD_PATTERN.findall(text.lower()):
+        tokens[word] += 1
+        if len(word) > 2:
+            for i in range(len(word) - 1):
+                tokens[word[i:i + 2]] += 1
+    return tokens
+
+
+@dataclass
+class MemoryEntry:
+    """저장된 인사이트 하나"""
+    entry_id: int
+    agent: str
+    text: str
+    created_at: float
+    tokens: Counter = field(repr=False, default_factory=Counter)
+
+
+class SessionMemory:
+    """
+    한 세션의 메모리 (최대 max_entries개, 오래된 것부터 제거)
+
+    token → entry_id 역색인을 같이 유지하여 검색 시 후보만 점수를 매긴다.
+    """
+
+    def __init__(self, max_entries: int):
+        self.entries: "OrderedDict[int, MemoryEntry]" = OrderedDict()
+        self.index: Dict[str, Set[int]] = {}
+        self.max_entries = max_entries
+
+    def add(self, entry: MemoryEntry):
+        self.entries[entry.entry_id] = entry
+        for token in entry.tokens:
+            self.index.setdefault(token, set()).add(entry.entry_id)
+
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+
+    def _remove(self, entry_id: int):
+        entry = self.entries.pop(entry_id)
+        for token in entry.tokens:
+            ids = self.index.get(token)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self.index[token]
+
+    def expire(self, before: float):
+        """created_at이 before보다 오래된 항목 제거 (오래된 순서로 저장되어 있음)"""
+        while self.entries:
+            entry_id, entry = next(iter(self.entries.items()))
+            if entry.created_at >= before:
+                break
+            self._remove(entry_id)
+
+    def search(self, query: Counter) -> List[Tuple[float, MemoryEntry]]:
+        """TF-IDF 점수로 후보 항목 정렬"""
+        total = len(self.entries)
+        scores: Dict[int, float] = {}
+        for token, query_tf in query.items():
+            ids = self.index.get(token)
+            if not ids:
+                continue
+            idf = math.log(1 + total / len(ids))
+            for entry_id in ids:
+                tf = self.entries[entry_id].tokens[token]
+                scores[entry_id] = scores.get(entry_id, 0.0) + query_tf * tf * idf
+
+        return [(score, self.entries[entry_id]) for entry_id, score in scores.items()]
+
+
+class AgentMemoryStore:
+    """
+    사용자/세션별 메모리 저장소 (모든 Agent가 공유, 데이터는 키로 격리)
+
+    - 세션당 최대 항목 수 (AGENT_MEMORY_MAX_ENTRIES)
+    - 전체 세션 수 LRU 제한 (AGENT_MEMORY_MAX_SESSIONS)
+    - 항목 TTL (AGENT_MEMORY_TTL, 초)
+
+    워커 간에 공유되지 않는다 (모듈 docstring 참고).
+    """
+
+    def __init__(self, max_sessions: Optional[int] = None, max_entries: Optional[int] = None,
+                 ttl: Optional[float] = None, max_text_length: int = 500):
+        self.max_sessions = max_sessions or int(os.getenv("AGENT_MEMORY_MAX_SESSIONS", "10000"))
+        self.max_entries = max_entries or int(os.getenv("AGENT_MEMORY_MAX_ENTRIES", "50"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("AGENT_MEMORY_TTL", "86400"))
+        self.max_text_length = max_text_length
+
+        self._sessions: "OrderedDict[Tuple[str, str], SessionMemory]" = OrderedDict()
+        self._user_sessions: Dict[str, Set[str]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _session(self, user_id: str, session_id: str, create: bool) -> Optional[SessionMemory]:
+        key = (user_id, session_id)
+        session = self._sessions.get(key)
+
+        if session is None:
+            if not create:
+                return None
+            session = SessionMemory(self.max_entries)
+            self._sessions[key] = session
+            self._user_sessions.setdefault(user_id, set()).add(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._drop(next(iter(self._sessions)))
+        else:
+            self._sessions.move_to_end(key)
+
+        if self.ttl:
+            session.expire(time.time() - self.ttl)
+        return session
+
+    def _drop(self, key: Tuple[str, str]):
+        del self._sessions[key]
+        user_id, session_id = key
+        sessions = self._user_sessions.get(user_id)
+        if sessions is not None:
+            sessions.discard(session_id)
+            if not sessions:
+                del self._user_sessions[user_id]
+
+    def remember(self, user_id: str, session_id: str, agent: str, text: str):
+        """인사이트 저장 (길이 제한 초과분은 잘라냄)"""
+        text = text[:self.max_text_length]
+        with self._lock:
+            session = self._session(user_id, session_id, create=True)
+            session.add(MemoryEntry(
+                entry_id=next(self._ids),
+                agent=agent,
+                text=text,
+                created_at=time.time(),
+                tokens=tokenize(text)
+            ))
+
+    def recall(self, user_id: str, query: str, session_id: Optional[str] = None, k: int = 3) -> List[MemoryEntry]:
+        """
+        query와 관련 있는 상위 k개 항목
+
+        session_id가 None이면 해당 사용자의 모든 세션에서 찾는다.
+        """
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+
+        with self._lock:
+            if session_id is not None:
+                session = self._session(user_id, session_id, create=False)
+                sessions: Iterable[SessionMemory] = [session] if session else []
+            else:
+                sessions = [
+                    self._session(user_id, sid, create=False)
+                    for sid in list(self._user_sessions.get(user_id, ()))
+                ]
+
+            scored: List[Tuple[float, MemoryEntry]] = []
+            for session in sessions:
+                scored.extend(session.search(query_tokens))
+
+        scored.sort(key=lambda item: (item[0], item[1].created_at), reverse=True)
+        return [entry for _, entry in scored[:k]]
+
+    def forget(self, user_id: str, session_id: Optional[str] = None):
+        """사용자(또는 특정 세션)의 메모리 삭제"""
+        with self._lock:
+            for sid in list(self._user_sessions.get(user_id, ())):
+                if session_id is None or sid == session_id:
+                    self._drop((user_id, sid))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "entries": sum(len(s.entries) for s in self._sessions.values())
+            }
+
+
+def format_memories(entries: List[MemoryEntry]) -> str:
+    """프롬프트에 넣을 형태로 변환"""
+    return "\n".join(f"- [{entry.agent}] {entry.text}" for entry in entries)
+
+
+_memory_store: Optional[AgentMemoryStore] = None
+
+
+def get_memory_store() -> AgentMemoryStore:
+    """프로세스 공용 메모리 저장소"""
+    global _memory_store
+    if _memory_store is None:
+        _memory_store = AgentMemoryStore()
+    return _memory_store
@@ -2,10 +2,28 @@
 """
 AI Agent System - 자율적으로 도구를 사용하고 협업하는 멀티 에이전트
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
+from datetime import datetime
 from enum import Enum
+import hashlib
 import json
+import os
+import uuid
+
+from report_renderer import get_renderer
+from notification_dispatcher import get_dispatcher
+from merchant_categorizer import get_categorizer
+from agent_memory import AgentMemoryStore, get_memory_store, format_memories
+from execution_context import ExecutionContext, ExecutionCancelled
+from budget_governor import BudgetExceeded
+from tracing import get_tracer, SPAN_KIND_CLIENT
+
+
+REPORT_OUTPUT_DIR = os.getenv(
+    "REPORT_OUTPUT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "reports")
+)
 
 
 # ===== Agent 메시지 프로토콜 =====
@@ -26,6 +44,34 @@ class AgentMessage:
     context: Dict[str, Any] = None
 
 
+def invoke_llm(provider, prompt: str, ctx: ExecutionContext, max_tokens: int = 2048,
+               temperature: float = 0.3, attributes: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    예산을 거쳐 LLM 호출 (span + 사용량 기록)
+
+    예산 때문에 LLM을 쓰지 않아야 하면 None을 반환한다 (호출자는 결정적 경로 사용).
+    """
+    if ctx.budget is not None:
+        provider = ctx.budget.select_provider(provider, prompt)
+        if provider is None:
+            return None
+
+    attributes = {
+        **(attributes or {}),
+        "llm.provider": provider.get_name(),
+        "llm.max_tokens": max_tokens,
+        "llm.prompt_chars": len(prompt)
+    }
+    with get_tracer().span("llm.analyze", ctx, kind=SPAN_KIND_CLIENT, attributes=attributes) as span:
+        response, usage = provider.analyze_with_usage(prompt, max_tokens=max_tokens, temperature=temperature)
+        span.set_attribute("llm.prompt_tokens", usage.get("prompt_tokens", 0))
+        span.set_attribute("llm.completion_tokens", usage.get("completion_tokens", 0))
+
+    if ctx.budget is not None:
+        ctx.budget.record(provider, usage)
+    return response
+
+
 # ===== Tool 정의 =====
 class Tool:
     """Agent가 사용할 수 있는 도구"""
@@ -35,10 +81,14 @@ class Tool:
         self.description = description
         self.parameters = parameters
 
-    def execute(self, **kwargs) -> Any:
-        """도구 실행 (하위 클래스에서 구현)"""
+    def execute(self, ctx: ExecutionContext, **kwargs) -> Any:
+        """도구 실행 (하위 클래스에서 구현, 요청별 상태는 ctx로만 접근)"""
         raise NotImplementedError
 
+    def summarize(self, result: Any) -> Optional[str]:
+        """메모리에 남길 한 줄 요약 (None이면 저장하지 않음)"""
+        return None
+
     def to_dict(self) -> Dict[str, Any]:
         """LLM에게 보여줄 도구 스펙"""
         return {
@@ -64,7 +114,7 @@ class FetchTransactionsTool(Tool):
         )
         self.codef_client = codef_client
 
-    def execute(self, user_id: str, month: str, account_id: Optional[str] = None) -> Dict[str, Any]:
+    def execute(self, ctx: ExecutionContext, user_id: str, month: str, account_id: Optional[str] = None) -> Dict[str, Any]:
         """실제 CODEF API 호출"""
         print(f"🔧 Tool: fetch_transactions(user_id={user_id}, month={month})")
 
@@ -81,6 +131,9 @@ class FetchTransactionsTool(Tool):
             "total_count": 3
         }
 
+    def summarize(self, result: Dict[str, Any]) -> Optional[str]:
+        return f"{result.get('month')} 거래 {result.get('total_count', 0)}건 조회"
+
 
 class AnalyzeSpendingTool(Tool):
     """소비 패턴 분석 도구"""
@@ -95,10 +148,40 @@ class AnalyzeSpendingTool(Tool):
             }
         )
         self.llm = llm_provider
+        self.categorizer = get_categorizer()
 
-    def execute(self, transactions: List[Dict], analysis_type: str = "pattern") -> Dict[str, Any]:
+    def _categorize(self, ctx: ExecutionContext, transactions: List[Dict]) -> Tuple[List[Dict], int]:
+        """
+        원문 가맹점명만 있는 거래에 카테고리 채움 (처음 보는 가맹점만 LLM에 물어봄)
+
+        요청 예산이 바닥나면 분류용 LLM 호출만 멈추고 나머지는 "기타"로 둔다
+        (워크플로우 중단은 다음 Agent의 LLM 호출에서 일어남).
+        """
+        def ask_llm(prompt: str) -> Optional[str]:
+            try:
+                return invoke_llm(self.llm, prompt, ctx, max_tokens=1024, temperature=0.0,
+                                  attributes={"tool.name": self.name})
+            except BudgetExceeded as e:
+                print(f"💸 [{self.name}] {e}, skipping merchant categorization")
+                return None
+
+        return self.categorizer.categorize_transactions(transactions, llm=ask_llm if self.llm else None)
+
+    def execute(self, ctx: ExecutionContext, transactions: List[Dict], analysis_type: str = "pattern") -> Dict[str, Any]:
         print(f"🔧 Tool: analyze_spending(count={len(transactions)}, type={analysis_type})")
 
+        # 같은 거래내역의 집계는 워커 간 공유 캐시 재사용
+        cache = ctx.cache("aggregates")
+        key = None
+        if cache is not None:
+            raw = json.dumps([transactions, analysis_type], ensure_ascii=False, sort_keys=True, default=str)
+            key = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        transactions, unresolved = self._categorize(ctx, transactions)
+
         # 간단한 통계 분석
         total = sum(tx["amount"] for tx in transactions)
         categories = {}
@@ -106,13 +189,38 @@ class AnalyzeSpendingTool(Tool):
             cat = tx["category"]
             categories[cat] = categories.get(cat, 0) + tx["amount"]
 
-        return {
+        result = {
             "total_amount": total,
             "categories": categories,
             "transaction_count": len(transactions),
             "top_category": max(categories, key=categories.get) if categories else None
         }
 
+        if analysis_type == "forecast" and transactions:
+            # numpy import 비용은 예측이 필요할 때만 지불
+            from forecast_engine import forecast_transactions
+            try:
+                result["forecast"] = forecast_transactions(transactions)
+            except (KeyError, TypeError, ValueError) as e:
+                # 날짜/금액 형식이 잘못된 거래가 있어도 기본 집계는 반환
+                print(f"⚠️  Forecast skipped: {e}")
+
+        # 분류하지 못한 가맹점이 있으면 ("기타"로 채운 임시 결과) 다음 요청에서 다시 계산
+        if cache is not None and not unresolved:
+            cache.set(key, result)
+
+        return result
+
+    def summarize(self, result: Dict[str, Any]) -> Optional[str]:
+        categories = sorted(result.get("categories", {}).items(), key=lambda item: item[1], reverse=True)
+        top = ", ".join(f"{cat} {amount:,}원" for cat, amount in categories[:3])
+        summary = f"총 {result.get('total_amount', 0):,}원 / {result.get('transaction_count', 0)}건, 상위: {top}"
+
+        forecast = result.get("forecast")
+        if forecast:
+            summary += f", 월말 예상 {forecast['total']['month_end']:,}원"
+        return summary
+
 
 class GenerateReportTool(Tool):
     """리포트 생성 도구"""
@@ -120,76 +228,112 @@ class GenerateReportTool(Tool):
     def __init__(self):
         super().__init__(
             name="generate_report",
-            description="분석 결과를 바탕으로 HTML 리포트를 생성합니다",
+            description="분석 결과를 바탕으로 HTML/Markdown/PDF 리포트를 생성합니다",
             parameters={
                 "analysis": "분석 결과",
                 "format": "리포트 형식 (html|pdf|markdown)"
             }
         )
+        self.renderer = get_renderer()
 
-    def execute(self, analysis: Dict, format: str = "html") -> Dict[str, Any]:
+    def execute(self, ctx: ExecutionContext, analysis: Dict, format: str = "html") -> Dict[str, Any]:
         print(f"🔧 Tool: generate_report(format={format})")
 
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head><title>소비 분석 리포트</title></head>
-        <body>
-            <h1>💰 소비 분석 리포트</h1>
-            <p>총 소비액: {analysis.get('total_amount', 0):,}원</p>
-            <p>거래 건수: {analysis.get('transaction_count', 0)}건</p>
-            <h2>카테고리별 소비</h2>
-            <ul>
-                {''.join(f"<li>{k}: {v:,}원</li>" for k, v in analysis.get('categories', {}).items())}
-            </ul>
-        </body>
-        </html>
-        """
+        # PDF는 바이너리이므로 파일로 저장
+        # 경로는 LLM 출력으로 받지 않고 항상 REPORT_OUTPUT_DIR 아래에 생성한 이름을 쓴다
+        if format == "pdf":
+            output_path = os.path.join(REPORT_OUTPUT_DIR, f"report-{uuid.uuid4().hex}.pdf")
+            size = self.renderer.render_to_file(analysis, output_path, format)
+            return {
+                "format": format,
+                "path": output_path,
+                "size": size
+            }
+
+        content = self.renderer.render_to_string(analysis, format)
 
         return {
             "format": format,
-            "content": html,
-            "size": len(html)
+            "content": content,
+            "size": len(content)
         }
 
+    def summarize(self, result: Dict[str, Any]) -> Optional[str]:
+        return f"{result.get('format')} 리포트 생성"
+
 
 class SendNotificationTool(Tool):
     """알림 발송 도구"""
 
-    def __init__(self):
+    def __init__(self, dispatcher=None):
         super().__init__(
             name="send_notification",
             description="사용자에게 이메일/슬랙/카카오톡 알림을 보냅니다",
             parameters={
-                "user_id": "사용자 ID",
                 "channel": "알림 채널 (email|slack|kakao)",
                 "message": "알림 메시지"
             }
         )
+        self.dispatcher = dispatcher
 
-    def execute(self, user_id: str, channel: str, message: str) -> Dict[str, Any]:
+    def execute(self, ctx: ExecutionContext, channel: str, message: str) -> Dict[str, Any]:
+        # 받는 사람은 LLM이 고르지 않는다: 요청한 사용자에게, 서버 설정의 주소로만 보냄
+        if not ctx.user_id:
+            raise ValueError("send_notification requires an authenticated user")
+        user_id = ctx.user_id
         print(f"🔧 Tool: send_notification(user={user_id}, channel={channel})")
 
-        # 실제로는 각 채널 API 호출
+        dispatcher = self.dispatcher or get_dispatcher()
+
+        # 아웃박스에 넣고 이 알림만 바로 발송 (같은 요청 안에서 같은 알림은 멱등 키로 한 번만 발송)
+        # 실패한 알림의 재시도와 대량 발송은 /notifications/dispatch가 담당
+        key = dispatcher.enqueue(user_id, channel, message, scope=ctx.request_id)
+        dispatcher.send(key)
+
+        entry = dispatcher.outbox.get(key) or {}
         return {
-            "status": "sent",
+            "status": entry.get("status", "pending"),
             "channel": channel,
             "user_id": user_id,
-            "sent_at": "2025-10-15T12:00:00Z"
+            "idempotency_key": key,
+            "sent_at": entry.get("sent_at"),
+            "error": entry.get("last_error")
         }
 
+    def summarize(self, result: Dict[str, Any]) -> Optional[str]:
+        return f"{result.get('channel')} 알림 {result.get('status')}"
+
+
+# ===== 결정적 경로 (LLM 미사용) =====
+REPORT_KEYWORDS = ("리포트", "보고서", "report")
+NOTIFY_KEYWORDS = ("보내", "알림", "이메일", "메일", "슬랙", "카카오")
+FORECAST_KEYWORDS = ("예측", "전망", "월말")
+
+
+def find_tool_result(ctx: ExecutionContext, tool_name: str) -> Optional[Dict[str, Any]]:
+    """이번 요청에서 가장 최근에 성공한 tool_name 결과"""
+    for step_result in reversed(list(ctx.shared_context.values())):
+        for r in reversed(step_result.get("results", [])):
+            if r.get("tool") == tool_name and r.get("status") == "success":
+                return r["result"]
+    return None
+
 
 # ===== Base AI Agent =====
 class BaseAIAgent:
     """AI Agent 기본 클래스"""
 
-    def __init__(self, name: str, role: str, llm_provider, tools: List[Tool] = None):
+    # 프롬프트에 넣을 과거 인사이트 수
+    MEMORY_TOP_K = 3
+
+    def __init__(self, name: str, role: str, llm_provider, tools: List[Tool] = None,
+                 memory: Optional[AgentMemoryStore] = None):
         self.name = name
         self.role = role
         self.llm = llm_provider
         self.tools = tools or []
-        self.memory = []  # 대화 기록
-        self.context = {}  # 공유 컨텍스트
+        # 사용자/세션별로 격리된 공용 저장소 (Agent 인스턴스에는 사용자 데이터를 두지 않음)
+        self.memory = memory or get_memory_store()
 
     def add_tool(self, tool: Tool):
         """도구 추가"""
@@ -208,26 +352,57 @@ class BaseAIAgent:
 
         return "\n".join(descriptions)
 
-    def execute_tool(self, tool_name: str, **kwargs) -> Any:
+    def execute_tool(self, tool_name: str, ctx: ExecutionContext, **kwargs) -> Any:
         """도구 실행"""
         for tool in self.tools:
             if tool.name == tool_name:
-                return tool.execute(**kwargs)
+                with get_tracer().span(f"tool.{tool_name}", ctx, attributes={"agent.name": self.name}):
+                    return tool.execute(ctx, **kwargs)
 
         raise ValueError(f"Tool not found: {tool_name}")
 
-    def think(self, task: str) -> Dict[str, Any]:
+    def call_llm(self, prompt: str, ctx: ExecutionContext, max_tokens: int = 2048,
+                 temperature: float = 0.3) -> Optional[str]:
+        """
+        LLM 호출 (span + 예산 기록)
+
+        예산 때문에 LLM을 쓰지 않아야 하면 None을 반환한다 (호출자는 결정적 경로 사용).
+        """
+        response = invoke_llm(self.llm, prompt, ctx, max_tokens=max_tokens, temperature=temperature,
+                              attributes={"agent.name": self.name})
+        if response is None:
+            print(f"💸 [{self.name}] Budget exhausted, using deterministic path")
+        return response
+
+    def deterministic_plan(self, task: str, ctx: ExecutionContext) -> Dict[str, Any]:
+        """LLM 없이 만드는 기본 계획 (하위 클래스에서 구현)"""
+        return {"reasoning": "기본 계획 없음", "actions": []}
+
+    def recall(self, task: str, ctx: ExecutionContext) -> str:
+        """작업과 관련된 과거 인사이트 상위 k개 (없으면 빈 문자열)"""
+        if not ctx.user_id:
+            return ""
+
+        entries = self.memory.recall(ctx.user_id, task, session_id=ctx.session_id, k=self.MEMORY_TOP_K)
+        return format_memories(entries)
+
+    def think(self, task: str, ctx: ExecutionContext, query: Optional[str] = None) -> Dict[str, Any]:
         """
         ReAct 패턴: Reason (생각) + Act (행동)
         LLM이 필요한 도구를 선택하고 사용
+
+        query: 메모리 검색어 (없으면 task). 이전 단계 결과가 붙은 task로 검색하면 유사도가 흐려진다.
         """
         print(f"\n🤔 [{self.name}] Thinking about: {task}")
 
+        memories = self.recall(query or task, ctx)
+        memory_section = f"\n관련 과거 인사이트:\n{memories}\n" if memories else ""
+
         # LLM에게 작업과 도구를 설명
         prompt = f"""당신은 {self.role}입니다.
 
 현재 작업: {task}
-
+{memory_section}
 사용 가능한 도구:
 {self.get_tools_description()}
 
@@ -246,8 +421,12 @@ class BaseAIAgent:
 }}
 """
 
+        ctx.check()
+
         try:
-            response = self.llm.analyze(prompt, max_tokens=2048, temperature=0.3)
+            response = self.call_llm(prompt, ctx, max_tokens=2048, temperature=0.3)
+            if response is None:
+                return self.deterministic_plan(task, ctx)
 
             # JSON 추출
             if "```json" in response:
@@ -261,6 +440,8 @@ class BaseAIAgent:
 
             return plan
 
+        except ExecutionCancelled:
+            raise
         except Exception as e:
             print(f"❌ Planning failed: {e}")
             return {
@@ -268,23 +449,28 @@ class BaseAIAgent:
                 "actions": []
             }
 
-    def act(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+    def act(self, plan: Dict[str, Any], ctx: ExecutionContext) -> Dict[str, Any]:
         """계획에 따라 도구를 실행"""
         results = []
 
         for action in plan.get("actions", []):
+            ctx.check()
+
             tool_name = action.get("tool")
             parameters = action.get("parameters", {})
 
             print(f"⚡ [{self.name}] Executing: {tool_name}")
 
             try:
-                result = self.execute_tool(tool_name, **parameters)
+                result = self.execute_tool(tool_name, ctx, **parameters)
                 results.append({
                     "tool": tool_name,
                     "status": "success",
                     "result": result
                 })
+            except ExecutionCancelled:
+                # 취소/예산 초과는 도구 실패가 아니라 워크플로우 중단
+                raise
             except Exception as e:
                 print(f"❌ Tool execution failed: {e}")
                 results.append({
@@ -298,10 +484,37 @@ class BaseAIAgent:
             "results": results
         }
 
-    def process(self, task: str) -> Dict[str, Any]:
-        """작업 처리: Think → Act"""
-        plan = self.think(task)
-        return self.act(plan)
+    def process(self, task: str, ctx: Optional[ExecutionContext] = None,
+                query: Optional[str] = None) -> Dict[str, Any]:
+        """작업 처리: Think → Act (query는 메모리 검색어, think 참고)"""
+        ctx = ctx or ExecutionContext()
+        with get_tracer().span("agent.think", ctx, attributes={"agent.name": self.name}):
+            plan = self.think(task, ctx, query=query)
+        with get_tracer().span("agent.act", ctx, attributes={"agent.name": self.name}) as span:
+            span.set_attribute("agent.actions", len(plan.get("actions", [])))
+            return self.act(plan, ctx)
+
+    def remember(self, task: str, result: Dict[str, Any], ctx: ExecutionContext):
+        """
+        작업 결과 요약을 사용자 메모리에 저장
+
+        도구 출력 원문(거래 목록, 리포트 HTML 등) 대신 도구별 한 줄 요약(합계, 상위 카테고리 등)만 남긴다.
+        """
+        if not ctx.user_id:
+            return
+
+        tools = {tool.name: tool for tool in self.tools}
+        summaries = []
+        for r in result.get("results", []):
+            tool = tools.get(r.get("tool"))
+            if r.get("status") == "success" and tool is not None:
+                summary = tool.summarize(r["result"])
+                if summary:
+                    summaries.append(summary)
+
+        if summaries:
+            self.memory.remember(ctx.user_id, ctx.session_id or "default", self.name,
+                                 f"{task} → {'; '.join(summaries)}")
 
 
 # ===== 구체적인 AI Agent 구현 =====
@@ -315,8 +528,10 @@ class OrchestratorAgent(BaseAIAgent):
             llm_provider=llm_provider
         )
 
-    def orchestrate(self, user_request: str, available_agents: List[BaseAIAgent]) -> Dict[str, Any]:
+    def orchestrate(self, user_request: str, available_agents: List[BaseAIAgent],
+                    ctx: Optional[ExecutionContext] = None) -> Dict[str, Any]:
         """사용자 요청을 분석하고 Agent들에게 작업 할당"""
+        ctx = ctx or ExecutionContext()
         print(f"\n🎯 [Orchestrator] Received request: {user_request}")
 
         # LLM에게 전체 계획 요청
@@ -345,8 +560,12 @@ class OrchestratorAgent(BaseAIAgent):
 }}
 """
 
+        ctx.check()
+
         try:
-            response = self.llm.analyze(prompt, max_tokens=2048, temperature=0.3)
+            response = self.call_llm(prompt, ctx, max_tokens=2048, temperature=0.3)
+            if response is None:
+                return self.deterministic_workflow(user_request, available_agents)
 
             if "```json" in response:
                 response = response.split("```json")[1].split("```")[0].strip()
@@ -357,10 +576,30 @@ class OrchestratorAgent(BaseAIAgent):
 
             return workflow
 
+        except ExecutionCancelled:
+            raise
         except Exception as e:
             print(f"❌ Orchestration failed: {e}")
             return {"workflow": [], "expected_outcome": "실패"}
 
+    def deterministic_workflow(self, user_request: str, available_agents: List[BaseAIAgent]) -> Dict[str, Any]:
+        """LLM 없이 키워드로 만드는 기본 워크플로우 (조회 → 분석 → 리포트 → 알림)"""
+        wants_notify = any(k in user_request for k in NOTIFY_KEYWORDS)
+        wants_report = wants_notify or any(k in user_request for k in REPORT_KEYWORDS)
+
+        steps = [("DataAgent", "거래내역 조회"), ("AnalyzerAgent", "소비 패턴 분석")]
+        if wants_report:
+            steps.append(("ReporterAgent", "분석 리포트 생성"))
+        if wants_notify:
+            steps.append(("NotificationAgent", "분석 결과 알림 발송"))
+
+        names = {a.name for a in available_agents}
+        workflow = [
+            {"step": i, "agent": agent, "task": f"{task} (요청: {user_request})", "dependencies": []}
+            for i, (agent, task) in enumerate([s for s in steps if s[0] in names], start=1)
+        ]
+        return {"workflow": workflow, "expected_outcome": "기본 분석 결과 (예산 제한으로 LLM 미사용)"}
+
 
 class DataAgent(BaseAIAgent):
     """데이터 수집 전문 Agent"""
@@ -375,6 +614,15 @@ class DataAgent(BaseAIAgent):
         # 도구 추가
         self.add_tool(FetchTransactionsTool(codef_client))
 
+    def deterministic_plan(self, task: str, ctx: ExecutionContext) -> Dict[str, Any]:
+        return {
+            "reasoning": "이번 달 거래내역 조회 (기본 계획)",
+            "actions": [{
+                "tool": "fetch_transactions",
+                "parameters": {"user_id": ctx.user_id or "anonymous", "month": datetime.now().strftime("%Y-%m")}
+            }]
+        }
+
 
 class AnalyzerAgent(BaseAIAgent):
     """분석 전문 Agent"""
@@ -388,6 +636,17 @@ class AnalyzerAgent(BaseAIAgent):
 
         self.add_tool(AnalyzeSpendingTool(llm_provider))
 
+    def deterministic_plan(self, task: str, ctx: ExecutionContext) -> Dict[str, Any]:
+        fetched = find_tool_result(ctx, "fetch_transactions") or {}
+        analysis_type = "forecast" if any(k in task for k in FORECAST_KEYWORDS) else "pattern"
+        return {
+            "reasoning": "조회된 거래내역 통계 분석 (기본 계획)",
+            "actions": [{
+                "tool": "analyze_spending",
+                "parameters": {"transactions": fetched.get("transactions", []), "analysis_type": analysis_type}
+            }]
+        }
+
 
 class ReporterAgent(BaseAIAgent):
     """리포트 생성 전문 Agent"""
@@ -401,6 +660,15 @@ class ReporterAgent(BaseAIAgent):
 
         self.add_tool(GenerateReportTool())
 
+    def deterministic_plan(self, task: str, ctx: ExecutionContext) -> Dict[str, Any]:
+        return {
+            "reasoning": "분석 결과 HTML 리포트 생성 (기본 계획)",
+            "actions": [{
+                "tool": "generate_report",
+                "parameters": {"analysis": find_tool_result(ctx, "analyze_spending") or {}, "format": "html"}
+            }]
+        }
+
 
 class NotificationAgent(BaseAIAgent):
     """알림 발송 전문 Agent"""
@@ -414,6 +682,21 @@ class NotificationAgent(BaseAIAgent):
 
         self.add_tool(SendNotificationTool())
 
+    def deterministic_plan(self, task: str, ctx: ExecutionContext) -> Dict[str, Any]:
+        channel = "slack" if "슬랙" in task else "kakao" if "카카오" in task else "email"
+        analysis = find_tool_result(ctx, "analyze_spending") or {}
+        message = (
+            f"이번 달 총 소비액은 {analysis.get('total_amount', 0):,}원, "
+            f"가장 많이 쓴 카테고리는 {analysis.get('top_category') or '-'}입니다."
+        )
+        return {
+            "reasoning": "분석 요약 알림 발송 (기본 계획)",
+            "actions": [{
+                "tool": "send_notification",
+                "parameters": {"channel": channel, "message": message}
+            }]
+        }
+
 
 # ===== Multi-Agent System =====
 class MultiAgentSystem:
@@ -436,18 +719,25 @@ class MultiAgentSystem:
             self.notification_agent
         ]
 
-    def execute(self, user_request: str) -> Dict[str, Any]:
-        """사용자 요청 실행"""
+    def execute(self, user_request: str, ctx: Optional[ExecutionContext] = None) -> Dict[str, Any]:
+        """
+        사용자 요청 실행
+
+        Agent들은 모든 요청이 공유하며, 요청별 상태는 ctx로만 전달한다.
+        """
+        ctx = ctx or ExecutionContext()
         print(f"\n{'='*60}")
         print(f"🚀 Multi-Agent System Starting")
         print(f"{'='*60}")
 
         # 1. Orchestrator가 계획 수립
-        workflow = self.orchestrator.orchestrate(user_request, self.agents)
+        with get_tracer().span("agent.orchestrate", ctx) as span:
+            workflow = self.orchestrator.orchestrate(user_request, self.agents, ctx)
+            span.set_attribute("workflow.steps", len(workflow.get("workflow", [])))
 
         # 2. 각 Agent가 순차적으로 작업 수행
         results = []
-        shared_context = {}
+        shared_context = ctx.shared_context
 
         for step in workflow.get("workflow", []):
             agent_name = step.get("agent")
@@ -456,6 +746,8 @@ class MultiAgentSystem:
             # Agent 찾기
             agent = next((a for a in self.agents if a.name == agent_name), None)
 
+            ctx.check()
+
             if agent:
                 print(f"\n{'─'*60}")
                 print(f"Step {step.get('step')}: {agent_name}")
@@ -467,7 +759,10 @@ class MultiAgentSystem:
                 if shared_context:
                     task_with_context += f"\n\n이전 단계 결과:\n{json.dumps(shared_context, ensure_ascii=False, indent=2)}"
 
-                result = agent.process(task_with_context)
+                step_attributes = {"workflow.step": str(step.get("step")), "agent.name": agent_name}
+                with get_tracer().span("workflow.step", ctx, attributes=step_attributes):
+                    result = agent.process(task_with_context, ctx, query=task)
+                agent.remember(task, result, ctx)
 
                 # 결과를 공유 컨텍스트에 저장
                 shared_context[agent_name] = result
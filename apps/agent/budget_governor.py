@@ -0,0 +1,225 @@
+# apps/agent/budget_governor.py
+"""
+LLM 토큰/비용 예산 관리
+요청 / 사용자(일) / 전체(일) 단위로 토큰과 예상 비용을 집계하고,
+한도에 가까워지면 더 저렴한 Provider → 결정적(LLM 없는) 경로로 낮추며,
+요청 하나가 폭주하면 워크플로우를 중단한다.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+import os
+import threading
+
+from execution_context import ExecutionCancelled
+from llm_providers import LLMProvider, estimate_tokens
+from shared_cache import SharedStore, get_store
+
+
+# 모델별 100만 토큰당 요금 (USD, 입력/출력)
+PRICING: Dict[str, Tuple[float, float]] = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "claude-sonnet-4": (3.00, 15.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+DEFAULT_PRICE = (3.00, 15.00)
+
+
+def get_price(model: str) -> Tuple[float, float]:
+    for prefix, price in PRICING.items():
+        if model.startswith(prefix):
+            return price
+    return DEFAULT_PRICE
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    input_price, output_price = get_price(model)
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+class BudgetExceeded(ExecutionCancelled):
+    """요청 단위 한도 초과로 워크플로우 중단"""
+    pass
+
+
+class BudgetLimits:
+    """환경변수로 조정 가능한 한도"""
+
+    def __init__(self):
+        self.max_calls_per_request = int(os.getenv("BUDGET_MAX_CALLS_PER_REQUEST", "20"))
+        self.max_tokens_per_request = int(os.getenv("BUDGET_MAX_TOKENS_PER_REQUEST", "60000"))
+        self.max_cost_per_request = float(os.getenv("BUDGET_MAX_COST_PER_REQUEST", "0.05"))
+        self.max_cost_per_user_day = float(os.getenv("BUDGET_MAX_COST_PER_USER_DAY", "0.50"))
+        self.max_cost_per_day = float(os.getenv("BUDGET_MAX_COST_PER_DAY", "20.0"))
+        # 한도의 이 비율을 넘으면 더 저렴한 Provider로 전환
+        self.degrade_ratio = float(os.getenv("BUDGET_DEGRADE_RATIO", "0.8"))
+
+
+class UsageLedger:
+    """일/사용자/Provider별 사용량 (SQLite, 워커 간 공유)"""
+
+    def __init__(self, store: SharedStore):
+        self.store = store
+        self.store.execute("""
+            CREATE TABLE IF NOT EXISTS llm_usage (
+                day TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                provider TEXT NOT NULL,
+                calls INTEGER NOT NULL DEFAULT 0,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                cost REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, user_id, provider)
+            )
+        """)
+
+    @staticmethod
+    def today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def record(self, user_id: str, provider: str, prompt_tokens: int, completion_tokens: int, cost: float):
+        self.store.execute(
+            "INSERT INTO llm_usage (day, user_id, provider, calls, prompt_tokens, completion_tokens, cost) "
+            "VALUES (?, ?, ?, 1, ?, ?, ?) "
+            "ON CONFLICT(day, user_id, provider) DO UPDATE SET "
+            "calls = calls + 1, prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+            "completion_tokens = completion_tokens + excluded.completion_tokens, cost = cost + excluded.cost",
+            (self.today(), user_id, provider, prompt_tokens, completion_tokens, cost)
+        )
+
+    def cost(self, user_id: Optional[str] = None) -> float:
+        if user_id is None:
+            row = self.store.execute(
+                "SELECT COALESCE(SUM(cost), 0) FROM llm_usage WHERE day = ?", (self.today(),)
+            ).fetchone()
+        else:
+            row = self.store.execute(
+                "SELECT COALESCE(SUM(cost), 0) FROM llm_usage WHERE day = ? AND user_id = ?",
+                (self.today(), user_id)
+            ).fetchone()
+        return row[0]
+
+    def summary(self, day: Optional[str] = None) -> Dict[str, Any]:
+        rows = self.store.execute(
+            "SELECT provider, SUM(calls), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost) "
+            "FROM llm_usage WHERE day = ? GROUP BY provider",
+            (day or self.today(),)
+        ).fetchall()
+        return {
+            provider: {"calls": calls, "prompt_tokens": pt, "completion_tokens": ct, "cost_usd": round(cost, 6)}
+            for provider, calls, pt, ct, cost in rows
+        }
+
+
+class RequestBudget:
+    """
+    요청 하나의 예산 (ExecutionContext.budget)
+
+    LLM 호출 전에 select_provider()로 사용할 Provider를 고르고, 호출 후 record()로 사용량을 남긴다.
+    """
+
+    def __init__(self, governor: "BudgetGovernor", user_id: Optional[str]):
+        self.governor = governor
+        self.user_id = user_id or "anonymous"
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.degraded: Optional[str] = None
+        self.providers: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _check_request_limits(self, prompt: str):
+        limits = self.governor.limits
+        if self.calls >= limits.max_calls_per_request:
+            raise BudgetExceeded(f"LLM call limit exceeded ({limits.max_calls_per_request} calls)")
+        if self.prompt_tokens + self.completion_tokens + estimate_tokens(prompt) > limits.max_tokens_per_request:
+            raise BudgetExceeded(f"token limit exceeded ({limits.max_tokens_per_request} tokens)")
+        if self.cost >= limits.max_cost_per_request:
+            raise BudgetExceeded(f"cost limit exceeded (${limits.max_cost_per_request})")
+
+    def select_provider(self, preferred: LLMProvider, prompt: str) -> Optional[LLMProvider]:
+        """
+        이번 호출에 쓸 Provider
+
+        Returns:
+            Provider, 또는 LLM을 쓰지 말고 결정적 경로로 처리해야 하면 None
+        Raises:
+            BudgetExceeded: 요청 단위 한도 초과 (워크플로우 중단)
+        """
+        self._check_request_limits(prompt)
+
+        limits = self.governor.limits
+        user_cost = self.governor.ledger.cost(self.user_id)
+        day_cost = self.governor.ledger.cost()
+
+        if user_cost >= limits.max_cost_per_user_day or day_cost >= limits.max_cost_per_day:
+            self.degraded = "deterministic"
+            return None
+
+        near_limit = (
+            user_cost >= limits.max_cost_per_user_day * limits.degrade_ratio
+            or day_cost >= limits.max_cost_per_day * limits.degrade_ratio
+            or self.cost >= limits.max_cost_per_request * limits.degrade_ratio
+        )
+        if near_limit:
+            cheapest = self.governor.cheapest_provider(preferred)
+            if cheapest is not preferred:
+                self.degraded = f"provider:{cheapest.get_name()}"
+            return cheapest
+
+        return preferred
+
+    def record(self, provider: LLMProvider, usage: Dict[str, int]):
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        cost = estimate_cost(provider.get_model(), prompt_tokens, completion_tokens)
+
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cost += cost
+            name = provider.get_name()
+            self.providers[name] = self.providers.get(name, 0) + 1
+
+        self.governor.ledger.record(self.user_id, provider.get_name(), prompt_tokens, completion_tokens, cost)
+
+    def summary(self) -> Dict[str, Any]:
+        """AgentResponse.usage"""
+        return {
+            "llm_calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "estimated_cost_usd": round(self.cost, 6),
+            "providers": dict(self.providers),
+            "degraded": self.degraded,
+            "user_day_cost_usd": round(self.governor.ledger.cost(self.user_id), 6)
+        }
+
+
+class BudgetGovernor:
+    """프로세스 공용 예산 관리자"""
+
+    def __init__(self, providers: Optional[List[LLMProvider]] = None, limits: Optional[BudgetLimits] = None,
+                 store: Optional[SharedStore] = None):
+        self.limits = limits or BudgetLimits()
+        self.ledger = UsageLedger(store or get_store())
+        # 저렴한 순서 (출력 토큰 단가 기준)
+        self.providers = sorted(providers or [], key=lambda p: get_price(p.get_model())[1])
+
+    def cheapest_provider(self, preferred: LLMProvider) -> LLMProvider:
+        """preferred보다 싼 Provider 중 가장 싼 것 (SDK 초기화에 실패한 Provider는 제외)"""
+        preferred_price = get_price(preferred.get_model())[1]
+        for provider in self.providers:
+            if get_price(provider.get_model())[1] >= preferred_price:
+                break
+            if provider.is_available() and provider.warmup():
+                return provider
+        return preferred
+
+    def warmup(self) -> List[str]:
+        """전환 후보 Provider를 미리 초기화해 예산 전환 시점에 SDK import가 일어나지 않게 함"""
+        return [provider.get_name() for provider in self.providers if provider.warmup()]
+
+    def new_request_budget(self, user_id: Optional[str]) -> RequestBudget:
+        return RequestBudget(self, user_id)
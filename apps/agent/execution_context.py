@@ -0,0 +1,79 @@
+# apps/agent/execution_context.py
+"""
+요청 단위 실행 컨텍스트
+Agent/Tool 인스턴스는 모든 요청이 공유하므로 상태를 갖지 않고,
+요청별 상태(사용자, 예산, 캐시 핸들, 트레이싱 span, 취소 토큰)는 이 객체로 전달한다.
+"""
+from typing import Any, Dict, Optional
+from dataclasses import dataclass, field
+import threading
+import time
+import uuid
+
+
+class ExecutionCancelled(Exception):
+    """요청이 취소되었거나 제한 시간을 넘김"""
+    pass
+
+
+class CancellationToken:
+    """스레드 간 공유 가능한 취소 신호"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "cancelled"):
+        self.reason = reason
+        self._event.set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+@dataclass
+class ExecutionContext:
+    """
+    /agent/execute 한 번에 해당하는 실행 컨텍스트
+
+    orchestrate → process → think → act → Tool.execute 순으로 그대로 전달된다.
+    """
+    user_id: Optional[str] = None
+    session_id: Optional[str] = None
+    request_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    # 절대 시각(time.time()) 기준 마감 시간
+    deadline: Optional[float] = None
+    # 토큰/비용 예산 (없으면 무제한)
+    budget: Optional[Any] = None
+    # 요청 동안 사용할 캐시 핸들 (이름 → SharedCache 등)
+    caches: Dict[str, Any] = field(default_factory=dict)
+    # 현재 트레이싱 span (없으면 None)
+    span: Optional[Any] = None
+    # 워크플로우 단계별 결과 (Agent 이름 → 결과)
+    shared_context: Dict[str, Any] = field(default_factory=dict)
+    cancel_token: CancellationToken = field(default_factory=CancellationToken)
+    started_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def with_timeout(cls, timeout: Optional[float], **kwargs) -> "ExecutionContext":
+        deadline = time.time() + timeout if timeout else None
+        return cls(deadline=deadline, **kwargs)
+
+    def cancel(self, reason: str = "cancelled"):
+        self.cancel_token.cancel(reason)
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.cancel_token.is_cancelled
+
+    def check(self):
+        """취소되었거나 마감 시간이 지났으면 ExecutionCancelled"""
+        if self.deadline is not None and time.time() > self.deadline and not self.is_cancelled:
+            self.cancel("deadline exceeded")
+
+        if self.is_cancelled:
+            raise ExecutionCancelled(self.cancel_token.reason)
+
+    def cache(self, name: str) -> Optional[Any]:
+        return self.caches.get(name)
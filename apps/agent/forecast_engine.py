@@ -0,0 +1,401 @@
+# apps/agent/forecast_engine.py
+"""
+월말 지출 예측 엔진
+카테고리별 일별 지출 시계열에 주간 계절성 지수평활(ETS(A,N,A))을 적용한다.
+
+- 증분 업데이트: 거래가 들어올 때마다 상태(level, 요일별 seasonal)만 갱신, 재학습 없음
+- 배치 모드: 모든 사용자/카테고리 시계열을 numpy 배열로 묶어 한 번에 학습/예측
+- 예측(읽기)은 상태의 사본으로 계산하므로 모델을 바꾸지 않는다. 날짜 확정은 update()만 한다.
+- 공용 엔진의 상태는 SharedStore(SQLite)에 저장되어 모든 워커가 같은 예측을 본다.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from calendar import monthrange
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+import json
+import threading
+
+import numpy as np
+
+from shared_cache import SharedStore, get_store
+
+
+SEASON_LENGTH = 7      # 요일 계절성
+ALPHA = 0.3            # level 평활 계수
+GAMMA = 0.1            # seasonal 평활 계수
+
+
+def _parse_date(value: Any) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _month_key(day: date) -> str:
+    return f"{day.year:04d}-{day.month:02d}"
+
+
+def _remaining_days(as_of: date) -> List[date]:
+    """as_of 다음 날부터 월말까지"""
+    last_day = monthrange(as_of.year, as_of.month)[1]
+    return [as_of + timedelta(days=i) for i in range(1, last_day - as_of.day + 1)]
+
+
+def _weekday_counts(days: Iterable[date]) -> np.ndarray:
+    counts = np.zeros(SEASON_LENGTH)
+    for day in days:
+        counts[day.weekday()] += 1
+    return counts
+
+
+class SeriesState:
+    """
+    한 (사용자, 카테고리) 시계열의 평활 상태
+
+    당일(open_date) 금액은 날짜가 넘어갈 때 확정되어 모델에 반영된다.
+    이미 확정된 날짜로 늦게 들어온 거래는 월 누적액에만 더하고 모델은 다시 맞추지 않는다.
+    한 사용자의 시계열은 모두 같은 시작일(origin)에서 출발하므로 지출이 없던 날도 0으로 들어간다.
+    """
+
+    __slots__ = ("level", "season", "n_days", "observed_total",
+                 "open_date", "open_amount", "month", "month_to_date")
+
+    def __init__(self):
+        self.level = 0.0
+        self.season = [0.0] * SEASON_LENGTH
+        self.n_days = 0
+        self.observed_total = 0.0
+        self.open_date: Optional[date] = None
+        self.open_amount = 0.0
+        self.month: Optional[str] = None
+        self.month_to_date = 0.0
+
+    def _observe(self, day: date, value: float):
+        k = day.weekday()
+        if self.n_days == 0:
+            self.level = value
+        else:
+            s = self.season[k]
+            level = ALPHA * (value - s) + (1 - ALPHA) * self.level
+            self.season[k] = GAMMA * (value - level) + (1 - GAMMA) * s
+            self.level = level
+        self.n_days += 1
+        self.observed_total += value
+
+    @classmethod
+    def starting_at(cls, origin: date) -> "SeriesState":
+        """origin부터 시작하는 빈 시계열 (첫 거래 전날까지는 0으로 확정됨)"""
+        state = cls()
+        state.open_date = origin
+        return state
+
+    @property
+    def origin(self) -> Optional[date]:
+        if self.open_date is None:
+            return None
+        return self.open_date - timedelta(days=self.n_days)
+
+    def copy(self) -> "SeriesState":
+        state = SeriesState()
+        for name in self.__slots__:
+            setattr(state, name, getattr(self, name))
+        state.season = list(self.season)
+        return state
+
+    def projected(self, day: date) -> "SeriesState":
+        """day까지 진행시킨 사본 (원본은 그대로)"""
+        state = self.copy()
+        state.advance(day)
+        return state
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data["open_date"] = self.open_date.isoformat() if self.open_date else None
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SeriesState":
+        state = cls()
+        for name in cls.__slots__:
+            setattr(state, name, data[name])
+        state.open_date = date.fromisoformat(data["open_date"]) if data["open_date"] else None
+        return state
+
+    def advance(self, day: date):
+        """day 전날까지 확정 (거래가 없던 날은 0으로 반영)"""
+        if self.open_date is None or day <= self.open_date:
+            return
+
+        self._observe(self.open_date, self.open_amount)
+        current = self.open_date + timedelta(days=1)
+        while current < day:
+            self._observe(current, 0.0)
+            current += timedelta(days=1)
+
+        self.open_date = day
+        self.open_amount = 0.0
+
+    def add(self, day: date, amount: float):
+        month = _month_key(day)
+        if self.month is None or month > self.month:
+            self.month = month
+            self.month_to_date = 0.0
+        if month == self.month:
+            self.month_to_date += amount
+
+        if self.open_date is None:
+            self.open_date = day
+        elif day > self.open_date:
+            self.advance(day)
+
+        if day == self.open_date:
+            self.open_amount += amount
+
+    def daily_forecast(self) -> List[float]:
+        """요일별 하루 예측 지출"""
+        if self.n_days >= SEASON_LENGTH:
+            return [max(0.0, self.level + s) for s in self.season]
+
+        # 계절성을 추정할 만큼 데이터가 없으면 런레이트(확정된 날 지출 / 경과 일수) 사용
+        # 당일(open_date)은 아직 진행 중이므로 하루치로 늘려 잡지 않는다
+        rate = self.observed_total / self.n_days if self.n_days else 0.0
+        return [rate] * SEASON_LENGTH
+
+    def forecast_month_end(self, as_of: date) -> Dict[str, float]:
+        month_to_date = self.month_to_date if self.month == _month_key(as_of) else 0.0
+        daily = self.daily_forecast()
+        remaining = sum(daily[day.weekday()] for day in _remaining_days(as_of))
+        return {
+            "month_to_date": round(month_to_date),
+            "remaining": round(remaining),
+            "month_end": round(month_to_date + remaining)
+        }
+
+
+class ForecastEngine:
+    """
+    사용자별 카테고리 시계열 상태를 보관하고 증분 갱신하는 엔진
+
+    store가 있으면 상태를 SQLite(forecast_state 테이블)에 저장해 워커 간에 공유하고,
+    갱신은 쓰기 트랜잭션 안에서 읽고-고치고-저장하므로 동시에 들어온 거래가 유실되지 않는다.
+    store가 없으면 메모리에만 둔다 (일회성 예측용).
+    """
+
+    def __init__(self, store: Optional[SharedStore] = None):
+        self.store = store
+        # user_id → category → 상태 (store가 없을 때만 사용)
+        self.states: Dict[str, Dict[str, SeriesState]] = {}
+        self._lock = threading.Lock()
+
+        if self.store is not None:
+            self.store.execute("""
+                CREATE TABLE IF NOT EXISTS forecast_state (
+                    user_id TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    PRIMARY KEY (user_id, category)
+                )
+            """)
+
+    @contextmanager
+    def _write(self) -> Iterator[None]:
+        """쓰기 구간 (store가 있으면 워커 간에도 직렬화되는 IMMEDIATE 트랜잭션)"""
+        with self._lock:
+            if self.store is None:
+                yield
+                return
+
+            conn = self.store._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _load(self, user_id: str) -> Dict[str, SeriesState]:
+        if self.store is None:
+            return self.states.get(user_id, {})
+
+        rows = self.store.execute(
+            "SELECT category, state FROM forecast_state WHERE user_id = ?", (user_id,)
+        ).fetchall()
+        return {category: SeriesState.from_dict(json.loads(state)) for category, state in rows}
+
+    def _load_all(self) -> Dict[str, Dict[str, SeriesState]]:
+        if self.store is None:
+            return self.states
+
+        states: Dict[str, Dict[str, SeriesState]] = {}
+        for user_id, category, state in self.store.execute(
+            "SELECT user_id, category, state FROM forecast_state"
+        ):
+            states.setdefault(user_id, {})[category] = SeriesState.from_dict(json.loads(state))
+        return states
+
+    def _save(self, user_id: str, states: Dict[str, SeriesState]):
+        if self.store is None:
+            self.states[user_id] = states
+            return
+
+        self.store._conn().executemany(
+            "INSERT OR REPLACE INTO forecast_state (user_id, category, state) VALUES (?, ?, ?)",
+            [(user_id, category, json.dumps(state.to_dict())) for category, state in states.items()]
+        )
+
+    @staticmethod
+    def _origin(categories: Dict[str, SeriesState], first_day: date) -> date:
+        """사용자 시계열의 공통 시작일 (처음이면 첫 거래가 있는 달의 1일)"""
+        origins = [s.origin for s in categories.values() if s.origin is not None]
+        return min(origins) if origins else first_day.replace(day=1)
+
+    def update(self, user_id: str, transactions: List[Dict[str, Any]]):
+        """새 거래 반영 (날짜순으로 넣으면 모델이 가장 정확하게 갱신됨, 날짜 없는 거래는 무시)"""
+        ordered = sorted((tx for tx in transactions if tx.get("date")), key=lambda tx: str(tx["date"]))
+        if not ordered:
+            return
+
+        with self._write():
+            categories = self._load(user_id)
+            origin = self._origin(categories, _parse_date(ordered[0]["date"]))
+            for tx in ordered:
+                category = tx.get("category") or "기타"
+                state = categories.get(category)
+                if state is None:
+                    # 드문 카테고리도 다른 카테고리와 같은 날부터 세어야 하루 평균이 부풀지 않는다
+                    state = categories[category] = SeriesState.starting_at(origin)
+                state.add(_parse_date(tx["date"]), float(tx["amount"]))
+            self._save(user_id, categories)
+
+    def fit_batch(self, keys: List[Tuple[str, str]], daily: np.ndarray, start: Any):
+        """
+        과거 일별 지출 행렬로 상태를 한 번에 초기화 (월간 배치 / 서버 시작 시)
+
+        Args:
+            keys: 행 순서대로 (user_id, category)
+            daily: (len(keys), 일수) 일별 지출 행렬
+            start: 첫 번째 열의 날짜
+        """
+        start_day = _parse_date(start)
+        n_days = daily.shape[1]
+        level, season = fit_daily_matrix(daily, start_day)
+
+        last_day = start_day + timedelta(days=n_days - 1)
+        month_start = max(0, n_days - last_day.day)
+        month_to_date = daily[:, month_start:].sum(axis=1)
+        totals = daily.sum(axis=1)
+
+        users: Dict[str, Dict[str, SeriesState]] = {}
+        for i, (user_id, category) in enumerate(keys):
+            state = SeriesState()
+            state.level = float(level[i])
+            state.season = season[i].tolist()
+            state.n_days = n_days
+            state.observed_total = float(totals[i])
+            state.open_date = last_day + timedelta(days=1)
+            state.month = _month_key(last_day)
+            state.month_to_date = float(month_to_date[i])
+            users.setdefault(user_id, {})[category] = state
+
+        with self._write():
+            for user_id, states in users.items():
+                if self.store is None:
+                    self.states.setdefault(user_id, {}).update(states)
+                else:
+                    self._save(user_id, states)
+
+    def forecast_month_end(self, user_id: str, as_of: Optional[Any] = None) -> Dict[str, Any]:
+        """카테고리별 월말 지출 예측 (저장된 상태는 바꾸지 않음)"""
+        with self._lock:
+            states = {cat: s.copy() for cat, s in self._load(user_id).items()}
+
+        if not states:
+            return {"as_of": None, "categories": {}, "total": {"month_to_date": 0, "remaining": 0, "month_end": 0}}
+
+        day = _parse_date(as_of) if as_of else max(s.open_date for s in states.values())
+        categories = {cat: s.projected(day).forecast_month_end(day) for cat, s in states.items()}
+
+        return {
+            "as_of": day.isoformat(),
+            "categories": categories,
+            "total": {
+                field: sum(c[field] for c in categories.values())
+                for field in ("month_to_date", "remaining", "month_end")
+            }
+        }
+
+    def forecast_batch(self, as_of: Any) -> Dict[str, Dict[str, float]]:
+        """
+        전체 사용자 월말 예측 (벡터화, 저장된 상태는 바꾸지 않음)
+
+        모든 시계열의 사본을 as_of로 진행시킨 뒤 요일 구성이 같으므로
+        (level + seasonal) × 남은 요일 수 를 행렬 곱 한 번으로 계산한다.
+        """
+        day = _parse_date(as_of)
+        month = _month_key(day)
+
+        with self._lock:
+            all_states = self._load_all()
+            keys = [(uid, cat) for uid, categories in all_states.items() for cat in categories]
+            states = [all_states[uid][cat].projected(day) for uid, cat in keys]
+
+        if not keys:
+            return {}
+
+        daily = np.array([s.daily_forecast() for s in states])
+        month_to_date = np.array([s.month_to_date if s.month == month else 0.0 for s in states])
+
+        remaining = daily @ _weekday_counts(_remaining_days(day))
+        month_end = month_to_date + remaining
+
+        result: Dict[str, Dict[str, float]] = {}
+        for (user_id, category), value in zip(keys, month_end):
+            result.setdefault(user_id, {})[category] = round(float(value))
+        return result
+
+
+def fit_daily_matrix(daily: np.ndarray, start: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    여러 시계열을 한꺼번에 학습 (배치 초기화용)
+
+    Args:
+        daily: (시계열 수, 일수) 일별 지출 행렬
+        start: 첫 번째 열의 날짜
+
+    Returns:
+        (level (N,), season (N, 7))
+    """
+    start_day = _parse_date(start)
+    n_series, n_days = daily.shape
+    level = daily[:, 0].astype(float) if n_days else np.zeros(n_series)
+    season = np.zeros((n_series, SEASON_LENGTH))
+
+    for t in range(1, n_days):
+        k = (start_day + timedelta(days=t)).weekday()
+        s = season[:, k]
+        new_level = ALPHA * (daily[:, t] - s) + (1 - ALPHA) * level
+        season[:, k] = GAMMA * (daily[:, t] - new_level) + (1 - GAMMA) * s
+        level = new_level
+
+    return level, season
+
+
+def forecast_transactions(transactions: List[Dict[str, Any]], as_of: Optional[Any] = None) -> Dict[str, Any]:
+    """저장 없이 주어진 거래내역만으로 월말 예측 (Tool용)"""
+    engine = ForecastEngine()
+    engine.update("_", transactions)
+    return engine.forecast_month_end("_", as_of)
+
+
+_engine: Optional[ForecastEngine] = None
+
+
+def get_forecast_engine() -> ForecastEngine:
+    """공용 엔진 (상태는 SharedStore에 있으므로 모든 워커가 같은 예측을 봄)"""
+    global _engine
+    if _engine is None:
+        _engine = ForecastEngine(get_store())
+    return _engine
@@ -3,10 +3,51 @@ LLM Provider 추상화
 여러 LLM을 쉽게 교체할 수 있도록 전략 패턴 적용
 """
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Optional, Dict, Any, List, Tuple
+import hashlib
+import importlib
+import importlib.util
+import threading
+import time
 import os
 
 
+# ===== SDK Import 프로파일링 =====
+# SDK 모듈 이름 -> import 소요 시간(초)
+IMPORT_TIMINGS: Dict[str, float] = {}
+
+
+def timed_import(module_name: str):
+    """
+    SDK 모듈을 import 하면서 소요 시간을 기록
+
+    Provider SDK(google.generativeai, anthropic, openai)는 import 자체가 무거우므로
+    실제로 사용할 때 한 번만 import 하고 그 비용을 IMPORT_TIMINGS에 남긴다.
+    """
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed = time.perf_counter() - start
+
+    if module_name not in IMPORT_TIMINGS:
+        IMPORT_TIMINGS[module_name] = elapsed
+        print(f"⏱️  import {module_name}: {elapsed * 1000:.1f}ms")
+
+    return module
+
+
+def estimate_tokens(text: str) -> int:
+    """SDK가 사용량을 주지 않을 때의 대략적인 토큰 수 (한글 기준 약 2자/토큰)"""
+    return len(text) // 2 + 1
+
+
+def is_module_installed(module_name: str) -> bool:
+    """모듈을 실제로 import 하지 않고 설치 여부만 확인"""
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
 class LLMProvider(ABC):
     """LLM Provider 추상 클래스"""
 
@@ -35,24 +76,92 @@ class LLMProvider(ABC):
         """사용 가능 여부 확인"""
         pass
 
+    def warmup(self) -> bool:
+        """SDK import 및 클라이언트 생성을 미리 수행 (기본: 아무것도 하지 않음)"""
+        return self.is_available()
+
+    def get_model(self) -> str:
+        """요금 계산용 모델 이름"""
+        return ""
+
+    def analyze_with_usage(self, prompt: str, max_tokens: int = 4096,
+                           temperature: float = 0.7) -> Tuple[str, Dict[str, int]]:
+        """
+        응답과 토큰 사용량을 함께 반환
+
+        Returns:
+            (응답 텍스트, {"prompt_tokens", "completion_tokens"})
+        """
+        text = self.analyze(prompt, max_tokens=max_tokens, temperature=temperature)
+        return text, {
+            "prompt_tokens": estimate_tokens(prompt),
+            "completion_tokens": estimate_tokens(text)
+        }
+
+
+class LazySDKProvider(LLMProvider):
+    """
+    SDK 클라이언트를 첫 사용 시점에 생성하는 Provider 기본 클래스
 
-class GeminiProvider(LLMProvider):
+    생성자에서는 API 키와 SDK 설치 여부만 확인하고, 실제 import와 클라이언트
+    생성은 analyze()/warmup() 최초 호출 시 한 번만 수행한다.
+    """
+
+    # 하위 클래스에서 지정
+    sdk_module: str = ""
+    display_name: str = ""
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key
+        self._client = None
+        self._init_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _create_client(self, sdk) -> Any:
+        """SDK 모듈로 클라이언트 생성 (하위 클래스에서 구현)"""
+        raise NotImplementedError
+
+    @property
+    def client(self):
+        if self._client is None and self._init_error is None and self.api_key:
+            with self._lock:
+                if self._client is None and self._init_error is None:
+                    try:
+                        sdk = timed_import(self.sdk_module)
+                        self._client = self._create_client(sdk)
+                        print(f"✅ {self.display_name} initialized (model: {self.get_model()})")
+                    except Exception as e:
+                        self._init_error = str(e)
+                        print(f"❌ {self.display_name} initialization failed: {e}")
+        return self._client
+
+    def get_model(self) -> str:
+        return getattr(self, "model", "")
+
+    def is_available(self) -> bool:
+        if not self.api_key or self._init_error is not None:
+            return False
+        return self._client is not None or is_module_installed(self.sdk_module)
+
+    def warmup(self) -> bool:
+        return self.client is not None
+
+
+class GeminiProvider(LazySDKProvider):
     """Google Gemini Provider (무료!)"""
 
+    sdk_module = "google.generativeai"
+    display_name = "Gemini"
+
     def __init__(self, api_key: Optional[str] = None):
-        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
-        self.client = None
-
-        if self.api_key:
-            try:
-                import google.generativeai as genai
-                genai.configure(api_key=self.api_key)
-                self.client = genai.GenerativeModel('gemini-2.5-flash')
-                print(f"✅ Gemini initialized (model: gemini-2.5-flash)")
-            except Exception as e:
-                print(f"❌ Gemini initialization failed: {e}")
+        super().__init__(api_key or os.getenv("GEMINI_API_KEY"))
+        self.model = "gemini-2.5-flash"
 
-    def analyze(self, prompt: str, max_tokens: int = 4096, temperature: float = 0.7) -> str:
+    def _create_client(self, genai) -> Any:
+        genai.configure(api_key=self.api_key)
+        return genai.GenerativeModel(self.model)
+
+    def _generate(self, prompt: str, max_tokens: int, temperature: float):
         if not self.client:
             raise Exception("Gemini client not initialized")
 
@@ -61,41 +170,46 @@ class GeminiProvider(LLMProvider):
             "max_output_tokens": max_tokens,
         }
 
-        response = self.client.generate_content(
+        return self.client.generate_content(
             prompt,
             generation_config=generation_config
         )
 
-        return response.text
+    def analyze(self, prompt: str, max_tokens: int = 4096, temperature: float = 0.7) -> str:
+        return self._generate(prompt, max_tokens, temperature).text
+
+    def analyze_with_usage(self, prompt: str, max_tokens: int = 4096,
+                           temperature: float = 0.7) -> Tuple[str, Dict[str, int]]:
+        response = self._generate(prompt, max_tokens, temperature)
+        text = response.text
+        meta = getattr(response, "usage_metadata", None)
+        return text, {
+            "prompt_tokens": getattr(meta, "prompt_token_count", 0) or estimate_tokens(prompt),
+            "completion_tokens": getattr(meta, "candidates_token_count", 0) or estimate_tokens(text)
+        }
 
     def get_name(self) -> str:
         return "Google Gemini 2.5 Flash"
 
-    def is_available(self) -> bool:
-        return self.client is not None
-
 
-class AnthropicProvider(LLMProvider):
+class AnthropicProvider(LazySDKProvider):
     """Anthropic Claude Provider"""
 
+    sdk_module = "anthropic"
+    display_name = "Anthropic"
+
     def __init__(self, api_key: Optional[str] = None, model: str = "claude-sonnet-4-20250514"):
-        self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+        super().__init__(api_key or os.getenv("ANTHROPIC_API_KEY"))
         self.model = model
-        self.client = None
 
-        if self.api_key:
-            try:
-                import anthropic
-                self.client = anthropic.Anthropic(api_key=self.api_key)
-                print(f"✅ Anthropic initialized (model: {model})")
-            except Exception as e:
-                print(f"❌ Anthropic initialization failed: {e}")
+    def _create_client(self, anthropic) -> Any:
+        return anthropic.Anthropic(api_key=self.api_key)
 
-    def analyze(self, prompt: str, max_tokens: int = 4096, temperature: float = 0.7) -> str:
+    def _generate(self, prompt: str, max_tokens: int, temperature: float):
         if not self.client:
             raise Exception("Anthropic client not initialized")
 
-        response = self.client.messages.create(
+        return self.client.messages.create(
             model=self.model,
             max_tokens=max_tokens,
             temperature=temperature,
@@ -104,36 +218,39 @@ class AnthropicProvider(LLMProvider):
             ]
         )
 
-        return response.content[0].text
+    def analyze(self, prompt: str, max_tokens: int = 4096, temperature: float = 0.7) -> str:
+        return self._generate(prompt, max_tokens, temperature).content[0].text
+
+    def analyze_with_usage(self, prompt: str, max_tokens: int = 4096,
+                           temperature: float = 0.7) -> Tuple[str, Dict[str, int]]:
+        response = self._generate(prompt, max_tokens, temperature)
+        return response.content[0].text, {
+            "prompt_tokens": response.usage.input_tokens,
+            "completion_tokens": response.usage.output_tokens
+        }
 
     def get_name(self) -> str:
         return f"Anthropic {self.model}"
 
-    def is_available(self) -> bool:
-        return self.client is not None
 
-
-class OpenAIProvider(LLMProvider):
+class OpenAIProvider(LazySDKProvider):
     """OpenAI GPT Provider"""
 
+    sdk_module = "openai"
+    display_name = "OpenAI"
+
     def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4o-mini"):
-        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        super().__init__(api_key or os.getenv("OPENAI_API_KEY"))
         self.model = model
-        self.client = None
 
-        if self.api_key:
-            try:
-                import openai
-                self.client = openai.OpenAI(api_key=self.api_key)
-                print(f"✅ OpenAI initialized (model: {model})")
-            except Exception as e:
-                print(f"❌ OpenAI initialization failed: {e}")
+    def _create_client(self, openai) -> Any:
+        return openai.OpenAI(api_key=self.api_key)
 
-    def analyze(self, prompt: str, max_tokens: int = 4096, temperature: float = 0.7) -> str:
+    def _generate(self, prompt: str, max_tokens: int, temperature: float):
         if not self.client:
             raise Exception("OpenAI client not initialized")
 
-        response = self.client.chat.completions.create(
+        return self.client.chat.completions.create(
             model=self.model,
             messages=[
                 {"role": "user", "content": prompt}
@@ -142,40 +259,107 @@ class OpenAIProvider(LLMProvider):
             temperature=temperature
         )
 
-        return response.choices[0].message.content
+    def analyze(self, prompt: str, max_tokens: int = 4096, temperature: float = 0.7) -> str:
+        return self._generate(prompt, max_tokens, temperature).choices[0].message.content
+
+    def analyze_with_usage(self, prompt: str, max_tokens: int = 4096,
+                           temperature: float = 0.7) -> Tuple[str, Dict[str, int]]:
+        response = self._generate(prompt, max_tokens, temperature)
+        return response.choices[0].message.content, {
+            "prompt_tokens": response.usage.prompt_tokens,
+            "completion_tokens": response.usage.completion_tokens
+        }
 
     def get_name(self) -> str:
         return f"OpenAI {self.model}"
 
+
+class CachedLLMProvider(LLMProvider):
+    """
+    응답 캐시를 붙인 Provider 래퍼
+
+    동일한 (provider, prompt, max_tokens, temperature) 요청은 캐시된 응답을 재사용한다.
+    cache는 get/set을 제공하는 객체(shared_cache.SharedCache)로, 워커 간 공유된다.
+    """
+
+    def __init__(self, provider: LLMProvider, cache, metrics=None):
+        self.provider = provider
+        self.cache = cache
+        self.metrics = metrics
+
+    def _key(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        raw = f"{self.provider.get_name()}|{max_tokens}|{temperature}|{prompt}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def analyze(self, prompt: str, max_tokens: int = 4096, temperature: float = 0.7) -> str:
+        return self.analyze_with_usage(prompt, max_tokens=max_tokens, temperature=temperature)[0]
+
+    def analyze_with_usage(self, prompt: str, max_tokens: int = 4096,
+                           temperature: float = 0.7) -> Tuple[str, Dict[str, int]]:
+        """캐시 적중 시 토큰 사용량은 0"""
+        key = self._key(prompt, max_tokens, temperature)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            if self.metrics:
+                self.metrics.incr("llm_cache_hits")
+            return cached, {"prompt_tokens": 0, "completion_tokens": 0}
+
+        response, usage = self.provider.analyze_with_usage(prompt, max_tokens=max_tokens, temperature=temperature)
+        self.cache.set(key, response)
+
+        if self.metrics:
+            self.metrics.incr("llm_calls")
+        return response, usage
+
+    def get_name(self) -> str:
+        return self.provider.get_name()
+
+    def get_model(self) -> str:
+        return self.provider.get_model()
+
     def is_available(self) -> bool:
-        return self.client is not None
+        return self.provider.is_available()
+
+    def warmup(self) -> bool:
+        return self.provider.warmup()
 
 
 class LLMProviderFactory:
     """LLM Provider Factory - 환경변수로 선택"""
 
     @staticmethod
-    def create_provider() -> Optional[LLMProvider]:
+    def create_provider(warm: bool = False) -> Optional[LLMProvider]:
         """
         환경변수 LLM_PROVIDER에 따라 적절한 Provider 반환
         우선순위: LLM_PROVIDER 설정 > Gemini > Anthropic > OpenAI
+
+        Provider 생성은 API 키/SDK 설치 여부만 확인하므로 가볍다.
+        SDK import는 선택된 Provider가 처음 사용될 때 한 번만 일어난다.
+
+        Args:
+            warm: True면 후보마다 SDK import/클라이언트 생성까지 해보고,
+                  초기화에 실패한 Provider는 건너뛴다 (lifespan warmup용)
         """
         provider_type = os.getenv("LLM_PROVIDER", "gemini").lower()
 
+        def usable(provider: LLMProvider) -> bool:
+            return provider.is_available() and (not warm or provider.warmup())
+
         # 명시적 선택
         if provider_type == "gemini":
             provider = GeminiProvider()
-            if provider.is_available():
+            if usable(provider):
                 return provider
 
         elif provider_type == "anthropic":
             provider = AnthropicProvider()
-            if provider.is_available():
+            if usable(provider):
                 return provider
 
         elif provider_type == "openai":
             provider = OpenAIProvider()
-            if provider.is_available():
+            if usable(provider):
                 return provider
 
         # Fallback: 사용 가능한 첫 번째 Provider 사용
@@ -183,9 +367,23 @@ class LLMProviderFactory:
 
         for ProviderClass in [GeminiProvider, AnthropicProvider, OpenAIProvider]:
             provider = ProviderClass()
-            if provider.is_available():
+            if usable(provider):
                 print(f"✅ Using fallback: {provider.get_name()}")
                 return provider
 
         print("❌ No LLM provider available")
-        return None
\ No newline at end of file
+        return None
+
+    @staticmethod
+    def create_available_providers() -> List[LLMProvider]:
+        """
+        API 키가 설정된 모든 Provider (예산 초과 시 더 저렴한 Provider로 전환할 후보)
+
+        생성만 하고 SDK는 실제로 사용될 때 import 된다.
+        """
+        providers = []
+        for ProviderClass in [GeminiProvider, AnthropicProvider, OpenAIProvider]:
+            provider = ProviderClass()
+            if provider.is_available():
+                providers.append(provider)
+        return providers
\ No newline at end of file
@@ -2,16 +2,27 @@
 """
 FinSight AI Agent - Multi-Agent System
 """
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
-from datetime import datetime
+from typing import List, Dict, Any, Optional
+from datetime import date, datetime
+import threading
+import time
 import os
 
 from dotenv import load_dotenv
 load_dotenv()
 
-from llm_providers import LLMProviderFactory
+from llm_providers import LLMProviderFactory, LLMProvider, CachedLLMProvider, IMPORT_TIMINGS
+from shared_cache import get_cache, get_metrics
+from report_renderer import get_renderer, SUPPORTED_FORMATS
+from notification_dispatcher import get_dispatcher
+from execution_context import ExecutionContext, ExecutionCancelled
+from tracing import get_tracer, set_current_span, reset_current_span, current_span
+from budget_governor import BudgetGovernor, BudgetExceeded
 from ai_agent_system import (
     MultiAgentSystem,
     DataAgent,
@@ -20,24 +31,130 @@ from ai_agent_system import (
     NotificationAgent
 )
 
+
+# ===== Lazy 초기화 =====
+# Provider/Agent 그래프는 import 시점이 아니라 첫 사용(또는 lifespan warmup) 시 생성
+llm_provider: Optional[LLMProvider] = None
+agent_system: Optional[MultiAgentSystem] = None
+budget_governor: Optional[BudgetGovernor] = None
+_initialized = False
+_init_lock = threading.Lock()
+
+# 초기화 단계별 소요 시간(초)
+STARTUP_TIMINGS: Dict[str, float] = {}
+
+
+def get_agent_system(warm: bool = False) -> Optional[MultiAgentSystem]:
+    """
+    Multi-Agent System 반환 (최초 호출 시 한 번만 생성)
+
+    warm=True면 Provider SDK를 미리 초기화하고, 실패하면 다음 Provider로 넘어간다.
+    """
+    global llm_provider, agent_system, budget_governor, _initialized
+
+    if _initialized:
+        return agent_system
+
+    with _init_lock:
+        if _initialized:
+            return agent_system
+
+        start = time.perf_counter()
+        llm_provider = LLMProviderFactory.create_provider(warm=warm)
+        STARTUP_TIMINGS["create_provider"] = time.perf_counter() - start
+
+        if llm_provider:
+            print(f"🤖 LLM Provider: {llm_provider.get_name()}")
+
+            # 예산 초과 시 전환할 후보 (SDK는 실제로 쓰일 때만 import)
+            fallbacks = [
+                p for p in LLMProviderFactory.create_available_providers()
+                if p.get_name() != llm_provider.get_name()
+            ]
+
+            # LLM 응답/워크플로우 계획은 워커 간 공유 캐시 사용
+            if os.getenv("LLM_CACHE", "true").lower() == "true":
+                llm_cache = get_cache("llm", ttl=float(os.getenv("LLM_CACHE_TTL", "3600")))
+                llm_provider = CachedLLMProvider(llm_provider, llm_cache, get_metrics())
+                fallbacks = [CachedLLMProvider(p, llm_cache, get_metrics()) for p in fallbacks]
+
+            budget_governor = BudgetGovernor([llm_provider] + fallbacks)
+
+            start = time.perf_counter()
+            agent_system = MultiAgentSystem(llm_provider)
+            STARTUP_TIMINGS["build_agents"] = time.perf_counter() - start
+            print(f"✅ Multi-Agent System initialized with {len(agent_system.agents)} agents")
+        else:
+            agent_system = None
+            print("⚠️  LLM not available. Multi-Agent features will be disabled.")
+
+        _initialized = True
+
+    return agent_system
+
+
+def warmup():
+    """
+    Agent 시스템 생성 + 선택된 Provider와 예산 전환 후보 Provider SDK를 미리 import
+
+    SDK/클라이언트 초기화에 실패한 Provider는 건너뛰고 다음 Provider를 사용한다.
+    AGENT_WARMUP=false 이면 건너뛰고 첫 요청 때 lazy 초기화한다
+    (이 경우 초기화 실패는 첫 LLM 호출에서 드러난다).
+    """
+    get_agent_system(warm=True)
+
+    # 예산 초과 시 전환할 Provider도 미리 초기화 (실패한 Provider는 전환 대상에서 빠짐)
+    if budget_governor:
+        start = time.perf_counter()
+        ready = budget_governor.warmup()
+        STARTUP_TIMINGS["warm_fallbacks"] = time.perf_counter() - start
+        print(f"🔁 Fallback providers ready: {', '.join(ready) or 'none'}")
+
+    total = sum(STARTUP_TIMINGS.values())
+    print(f"⏱️  Warmup completed in {total * 1000:.1f}ms")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if os.getenv("AGENT_WARMUP", "true").lower() == "true":
+        warmup()
+    yield
+
+    # 종료 직전 몇 초 동안의 span이 유실되지 않도록 남은 span을 내보냄
+    tracer = get_tracer()
+    if tracer.processor:
+        tracer.processor.flush()
+
+
 app = FastAPI(
     title="FinSight Multi-Agent System",
     description="자율적으로 협업하는 AI Agent 시스템",
-    version="0.4.0"
+    version="0.4.0",
+    lifespan=lifespan
 )
 
-# LLM Provider 초기화
-llm_provider = LLMProviderFactory.create_provider()
 
-if llm_provider:
-    print(f"🤖 LLM Provider: {llm_provider.get_name()}")
-
-    # Multi-Agent System 초기화
-    agent_system = MultiAgentSystem(llm_provider)
-    print(f"✅ Multi-Agent System initialized with {len(agent_system.agents)} agents")
-else:
-    agent_system = None
-    print("⚠️  LLM not available. Multi-Agent features will be disabled.")
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """traceparent 헤더를 이어받아 요청 단위 서버 span 생성"""
+    tracer = get_tracer()
+    span = tracer.start_server_span(
+        f"{request.method} {request.url.path}",
+        request.headers.get("traceparent"),
+        attributes={"http.method": request.method, "http.target": request.url.path}
+    )
+    token = set_current_span(span)
+    try:
+        response = await call_next(request)
+        span.set_attribute("http.status_code", response.status_code)
+        response.headers["traceparent"] = span.context.to_traceparent()
+        return response
+    except Exception as e:
+        span.record_error(e)
+        raise
+    finally:
+        reset_current_span(token)
+        tracer.end(span)
 
 
 # ===== 기존 모델 (유지) =====
@@ -61,11 +178,18 @@ class AgentRequest(BaseModel):
     """사용자의 자연어 요청"""
     user_id: str
     request: str
+    session_id: Optional[str] = None
     # 예: "10월 소비 분석해서 이메일로 보내줘"
     # 예: "카페 지출이 너무 많은데 줄일 방법 알려줘"
     # 예: "예산 대비 소비 현황 리포트 만들어줘"
 
 
+class ReportRequest(BaseModel):
+    """분석 결과로 리포트 렌더링"""
+    analysis: Dict[str, Any]
+    format: str = "html"
+
+
 class AgentResponse(BaseModel):
     user_id: str
     request: str
@@ -73,11 +197,13 @@ class AgentResponse(BaseModel):
     results: List[Dict[str, Any]]
     execution_time: float
     status: str
+    usage: Dict[str, Any] = {}
 
 
 # ===== 기존 엔드포인트 (유지) =====
 @app.get("/")
 def root():
+    agent_system = get_agent_system()
     return {
         "service": "FinSight Multi-Agent System",
         "status": "running",
@@ -93,9 +219,40 @@ def root():
     }
 
 
+@app.get("/startup")
+def startup_profile():
+    """초기화 및 SDK import 소요 시간 (ms)"""
+    return {
+        "initialized": _initialized,
+        "startup_ms": {k: round(v * 1000, 1) for k, v in STARTUP_TIMINGS.items()},
+        "imports_ms": {k: round(v * 1000, 1) for k, v in IMPORT_TIMINGS.items()}
+    }
+
+
+@app.get("/usage")
+def llm_usage(day: Optional[str] = None):
+    """오늘(또는 지정한 날)의 Provider별 LLM 사용량/예상 비용"""
+    get_agent_system()
+    if not budget_governor:
+        raise HTTPException(status_code=503, detail="Agent system not available")
+    return {"day": day or budget_governor.ledger.today(), "providers": budget_governor.ledger.summary(day)}
+
+
+@app.get("/metrics")
+def metrics():
+    """전체 워커 합산 메트릭 + 워커별 메트릭"""
+    aggregated = get_metrics().aggregate()
+    return {
+        "pid": os.getpid(),
+        "total": aggregated["total"],
+        "workers": aggregated["workers"]
+    }
+
+
 @app.get("/agents")
 def list_agents():
     """사용 가능한 Agent 목록"""
+    agent_system = get_agent_system()
     if not agent_system:
         raise HTTPException(status_code=503, detail="Agent system not available")
 
@@ -122,20 +279,40 @@ async def execute_agent_request(request: AgentRequest) -> AgentResponse:
     - "카페 지출 줄이는 방법 알려줘"
     - "이번 달 예산 현황 리포트 만들어"
     """
+    agent_system = get_agent_system()
     if not agent_system:
         raise HTTPException(
             status_code=503,
             detail="Multi-Agent system not available. Please configure LLM provider."
         )
 
-    import time
     start_time = time.time()
 
+    # 요청별 실행 컨텍스트 (Agent 인스턴스는 모든 요청이 공유)
+    ctx = ExecutionContext.with_timeout(
+        float(os.getenv("AGENT_REQUEST_TIMEOUT", "120")),
+        user_id=request.user_id,
+        session_id=request.session_id,
+        caches={"aggregates": get_cache("aggregates", ttl=3600)},
+        span=current_span(),
+        budget=budget_governor.new_request_budget(request.user_id) if budget_governor else None
+    )
+
+    # 워크플로우와 메트릭/사용량 기록(SQLite)은 모두 동기 코드이므로 스레드풀에서 실행해 이벤트 루프를 막지 않음
+    return await run_in_threadpool(run_agent_request, agent_system, request, ctx, start_time)
+
+
+def run_agent_request(agent_system: MultiAgentSystem, request: AgentRequest, ctx: ExecutionContext,
+                      start_time: float) -> AgentResponse:
+    """Multi-Agent System 실행 + 워커 메트릭 기록"""
+    metrics = get_metrics()
+    metrics.incr("requests")
+
     try:
-        # Multi-Agent System 실행
-        result = agent_system.execute(request.request)
+        result = agent_system.execute(request.request, ctx)
 
         execution_time = time.time() - start_time
+        metrics.incr("execution_seconds", execution_time)
 
         return AgentResponse(
             user_id=request.user_id,
@@ -143,11 +320,22 @@ async def execute_agent_request(request: AgentRequest) -> AgentResponse:
             workflow=result.get("workflow", {}),
             results=result.get("results", []),
             execution_time=execution_time,
-            status="success"
+            status="success",
+            usage=ctx.budget.summary() if ctx.budget else {}
         )
 
     except Exception as e:
         execution_time = time.time() - start_time
+        ctx.cancel("request failed")
+        metrics.incr("failures")
+        metrics.incr("execution_seconds", execution_time)
+
+        if isinstance(e, BudgetExceeded):
+            status = "budget_exceeded"
+        elif isinstance(e, ExecutionCancelled):
+            status = "cancelled"
+        else:
+            status = "failed"
 
         return AgentResponse(
             user_id=request.user_id,
@@ -158,7 +346,8 @@ async def execute_agent_request(request: AgentRequest) -> AgentResponse:
                 "type": type(e).__name__
             }],
             execution_time=execution_time,
-            status="failed"
+            status=status,
+            usage=ctx.budget.summary() if ctx.budget else {}
         )
 
 
@@ -167,18 +356,105 @@ async def execute_simple_agent(request: AgentRequest):
     """
     단일 Agent 테스트 (간단한 버전)
     """
+    agent_system = get_agent_system()
     if not agent_system:
         raise HTTPException(status_code=503, detail="Agent system not available")
 
-    # 간단히 DataAgent만 실행
-    result = agent_system.data_agent.process(
-        f"사용자 {request.user_id}의 거래내역을 가져와주세요"
+    # 간단히 DataAgent만 실행 (LLM 호출이 있으므로 /agent/execute와 같은 예산 적용)
+    ctx = ExecutionContext(
+        user_id=request.user_id,
+        session_id=request.session_id,
+        span=current_span(),
+        budget=budget_governor.new_request_budget(request.user_id) if budget_governor else None
     )
+    try:
+        result = await run_in_threadpool(
+            agent_system.data_agent.process,
+            f"사용자 {request.user_id}의 거래내역을 가져와주세요",
+            ctx
+        )
+    except BudgetExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
 
     return {
         "user_id": request.user_id,
         "agent": "DataAgent",
-        "result": result
+        "result": result,
+        "usage": ctx.budget.summary() if ctx.budget else {}
+    }
+
+
+# ===== 리포트 =====
+REPORT_MEDIA_TYPES = {
+    "html": "text/html; charset=utf-8",
+    "markdown": "text/markdown; charset=utf-8",
+    "pdf": "application/pdf"
+}
+
+
+@app.post("/report/render")
+def render_report(request: ReportRequest):
+    """리포트를 메모리에 모으지 않고 바로 스트리밍"""
+    if request.format not in SUPPORTED_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {request.format}")
+
+    chunks = get_renderer().render(request.analysis, request.format)
+    return StreamingResponse(chunks, media_type=REPORT_MEDIA_TYPES[request.format])
+
+
+# ===== 지출 예측 =====
+class ForecastTransaction(BaseModel):
+    """예측에 반영할 거래 한 건 (카테고리가 없으면 기타)"""
+    date: date
+    amount: float
+    category: Optional[str] = None
+
+
+class ForecastIngestRequest(BaseModel):
+    """새로 들어온 거래 (증분 반영)"""
+    user_id: str
+    transactions: List[ForecastTransaction]
+
+
+@app.post("/forecast/transactions")
+def ingest_forecast_transactions(request: ForecastIngestRequest):
+    """새 거래를 예측 상태에 반영 (재학습 없이 증분 갱신)"""
+    from forecast_engine import get_forecast_engine
+
+    engine = get_forecast_engine()
+    engine.update(request.user_id, [tx.model_dump() for tx in request.transactions])
+    return engine.forecast_month_end(request.user_id)
+
+
+@app.get("/forecast/{user_id}")
+def get_month_end_forecast(user_id: str, as_of: Optional[str] = None):
+    """카테고리별 월말 지출 예측"""
+    from forecast_engine import get_forecast_engine
+
+    try:
+        day = date.fromisoformat(as_of) if as_of else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid as_of date: {as_of}")
+
+    return get_forecast_engine().forecast_month_end(user_id, day)
+
+
+# ===== 알림 =====
+@app.post("/notifications/dispatch")
+def dispatch_notifications():
+    """
+    아웃박스에 쌓인 알림 발송을 백그라운드에서 시작 (월간 배치 등)
+
+    발송은 채널 한도에 맞춰 오래 걸리므로 시작만 하고 바로 반환한다.
+    진행 상황은 outbox 상태별 건수와 last_run으로 확인한다.
+    """
+    dispatcher = get_dispatcher()
+    started = dispatcher.start_dispatch()
+    return {
+        "started": started,
+        "running": dispatcher.is_running,
+        "last_run": dispatcher.last_run,
+        "outbox": dispatcher.outbox.counts()
     }
 
 
@@ -199,7 +475,14 @@ async def analyze_with_llm_endpoint(request: AnalysisRequest):
 
 if __name__ == "__main__":
     import uvicorn
-    print("🚀 Starting FinSight Multi-Agent System...")
-    print(f"🤖 LLM: {llm_provider.get_name() if llm_provider else 'Disabled'}")
-    print(f"🔧 Agents: {len(agent_system.agents) if agent_system else 0}")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    workers = int(os.getenv("AGENT_WORKERS", "1"))
+    print(f"🚀 Starting FinSight Multi-Agent System... (workers={workers})")
+
+    # 이전 실행의 워커 메트릭 정리 (워커 fork 전에 한 번)
+    get_metrics().reset()
+
+    if workers > 1:
+        # 멀티 워커는 import 문자열로 실행해야 각 워커가 앱을 다시 로드한다
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,356 @@
+# apps/agent/merchant_categorizer.py
+"""
+가맹점 카테고리 분류
+CODEF 거래내역의 가맹점명(원문)을 정규화한 뒤
+사전(해시 + 접두사 트라이) → 키워드 규칙 → LLM 결과 캐시 → LLM 순서로 카테고리를 정한다.
+
+거래마다가 아니라 고유 가맹점마다 한 번만 판단하므로 1년치 내역도 수 ms 안에 끝나고,
+LLM에는 처음 보는 가맹점만 묶어서 물어본다.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from collections import OrderedDict
+from functools import lru_cache
+import json
+import os
+import re
+import threading
+
+from shared_cache import SharedCache, get_cache
+
+
+UNKNOWN_CATEGORY = "기타"
+
+CATEGORIES = (
+    "식비", "카페", "편의점", "마트", "온라인쇼핑", "쇼핑", "교통", "주유",
+    "구독", "통신", "의료", "문화", "교육", "공과금", UNKNOWN_CATEGORY,
+)
+
+# 카테고리 → 대표 가맹점명 (정규화 전 표기 그대로 적어도 됨)
+MERCHANT_DICTIONARY: Dict[str, Tuple[str, ...]] = {
+    "카페": (
+        "스타벅스", "starbucks", "이디야", "투썸플레이스", "투썸", "메가커피", "메가MGC커피",
+        "컴포즈커피", "빽다방", "할리스", "폴바셋", "커피빈", "파스쿠찌", "엔제리너스", "블루보틀",
+    ),
+    "식비": (
+        "배달의민족", "우아한형제들", "요기요", "쿠팡이츠", "맥도날드", "버거킹", "롯데리아", "KFC",
+        "맘스터치", "서브웨이", "파리바게뜨", "뚜레쥬르", "BHC", "BBQ", "교촌치킨", "도미노피자",
+        "김밥천국", "본죽",
+    ),
+    "편의점": ("GS25", "CU", "세븐일레븐", "코리아세븐", "이마트24", "미니스톱", "BGF리테일"),
+    "마트": ("이마트", "홈플러스", "롯데마트", "코스트코", "트레이더스", "노브랜드", "하나로마트"),
+    "온라인쇼핑": (
+        "쿠팡", "coupang", "11번가", "G마켓", "옥션", "SSG.COM", "네이버쇼핑", "스마트스토어",
+        "무신사", "29CM", "지그재그", "마켓컬리", "컬리", "오늘의집", "알리익스프레스", "aliexpress",
+        "Apple", "아마존", "amazon",
+    ),
+    "쇼핑": ("올리브영", "다이소", "유니클로", "신세계백화점", "롯데백화점", "현대백화점", "ABC마트"),
+    "교통": (
+        "카카오T", "카카오모빌리티", "티머니", "코레일", "한국철도공사", "SRT", "에스알", "대한항공",
+        "아시아나항공", "제주항공", "타다", "쏘카",
+    ),
+    "주유": ("SK에너지", "GS칼텍스", "S-OIL", "에쓰오일", "현대오일뱅크", "알뜰주유소"),
+    "구독": (
+        "넷플릭스", "netflix", "유튜브프리미엄", "YouTube Premium", "google youtube", "디즈니플러스",
+        "disney plus", "티빙", "웨이브", "왓챠", "멜론", "지니뮤직", "spotify", "APPLE.COM/BILL",
+        "쿠팡와우", "네이버플러스", "chatgpt", "openai",
+    ),
+    "통신": ("SK텔레콤", "SKT", "KT", "LG유플러스", "LGU+", "알뜰폰"),
+    "문화": ("CGV", "메가박스", "롯데시네마", "인터파크티켓", "yes24티켓", "멜론티켓"),
+    "교육": ("교보문고", "yes24", "알라딘", "영풍문고", "클래스101", "인프런", "패스트캠퍼스"),
+    "공과금": ("한국전력", "한전", "도시가스", "서울도시가스", "상수도사업본부", "국민건강보험"),
+}
+
+# 사전에 없을 때 쓰는 키워드 규칙 (위에서부터 먼저 맞는 규칙 적용)
+KEYWORD_RULES: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("카페", ("커피", "카페", "coffee", "cafe", "다방", "티하우스")),
+    ("편의점", ("편의점",)),
+    ("마트", ("마트", "슈퍼", "mart", "식자재")),
+    ("주유", ("주유", "충전소", "오일", "에너지")),
+    ("교통", ("택시", "버스", "철도", "지하철", "고속도로", "하이패스", "주차", "항공", "렌터카")),
+    ("의료", ("병원", "의원", "약국", "치과", "한의원", "안과", "피부과", "내과", "정형외과")),
+    ("교육", ("학원", "서점", "문고", "교습소", "아카데미")),
+    ("문화", ("영화", "시네마", "극장", "공연", "티켓", "노래", "pc방", "볼링")),
+    ("통신", ("텔레콤", "통신", "모바일", "telecom")),
+    ("공과금", ("관리비", "전력", "가스", "수도", "아파트")),
+    ("식비", (
+        "식당", "김밥", "치킨", "피자", "분식", "국밥", "떡볶이", "베이커리", "제과", "베이글",
+        "고기", "갈비", "삼겹", "초밥", "스시", "횟집", "반점", "짬뽕", "냉면", "국수", "버거",
+        "푸드", "키친", "주점", "포차", "호프",
+    )),
+    ("쇼핑", ("백화점", "아울렛", "쇼핑몰", "의류", "뷰티", "화장품")),
+)
+
+# 결제대행사 접두사 ("KCP-무신사", "네이버페이_OO상점" 등)
+_PG_PREFIX = re.compile(
+    r"^\s*(?:네이버페이|naver\s*pay|카카오페이|kakao\s*pay|토스페이먼츠|toss\s*payments|토스페이|"
+    r"kg이니시스|이니시스|inicis|nhn\s*kcp|kcp|nice페이|nicepay|nice|paypal|페이팔|다날)"
+    r"\s*[-_*/:.)\]]\s*(?=\S)",
+    re.IGNORECASE
+)
+# 법인 표기
+_CORPORATE = re.compile(
+    r"\(주\)|㈜|주식회사|\(유\)|유한회사|\(사\)|"
+    r"\bco\.?,?\s*ltd\.?|\binc\b\.?|\bcorp\b\.?|\bcorporation\b",
+    re.IGNORECASE
+)
+_NON_WORD = re.compile(r"[^0-9a-z가-힣]+")
+_ASCII_LETTER = re.compile(r"[a-z]")
+
+# 영문 키는 이 길이 이상이거나 뒤에 영문자가 이어지지 않을 때만 접두사 매칭 ("cu" ≠ "cupang")
+_MIN_ASCII_PREFIX = 5
+
+
+@lru_cache(maxsize=65536)
+def normalize_merchant(raw: str) -> str:
+    """
+    가맹점명 정규화
+
+    결제대행사 접두사와 법인 표기를 떼고, 소문자로 바꾼 뒤 한글/영문/숫자만 남긴다.
+    예) "KCP-(주)무신사 " → "무신사", "스타벅스 강남R점" → "스타벅스강남r점"
+    """
+    text = _PG_PREFIX.sub("", raw or "")
+    text = _CORPORATE.sub(" ", text)
+    return _NON_WORD.sub("", text.lower())
+
+
+class MerchantIndex:
+    """
+    정규화된 가맹점명 → 카테고리 사전
+
+    완전 일치는 해시 조회, 지점명이 붙은 경우("gs25역삼점")는 트라이에서 가장 긴 접두사로 찾는다.
+    """
+
+    _END = ""
+
+    def __init__(self, dictionary: Optional[Dict[str, Iterable[str]]] = None):
+        self.exact: Dict[str, str] = {}
+        self.trie: Dict[str, Any] = {}
+        for category, merchants in (dictionary or MERCHANT_DICTIONARY).items():
+            for merchant in merchants:
+                self.add(merchant, category)
+
+    def add(self, merchant: str, category: str):
+        key = normalize_merchant(merchant)
+        if not key:
+            return
+        self.exact[key] = category
+
+        node = self.trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[self._END] = category
+
+    def lookup(self, name: str) -> Optional[str]:
+        """정규화된 이름의 카테고리 (없으면 None)"""
+        category = self.exact.get(name)
+        if category is not None:
+            return category
+
+        best: Optional[str] = None
+        node = self.trie
+        for i, char in enumerate(name):
+            node = node.get(char)
+            if node is None:
+                break
+            category = node.get(self._END)
+            if category is not None and self._prefix_allowed(name, i + 1):
+                best = category
+        return best
+
+    @staticmethod
+    def _prefix_allowed(name: str, length: int) -> bool:
+        if length >= len(name) or length >= _MIN_ASCII_PREFIX or not _ASCII_LETTER.match(name[length - 1]):
+            return True
+        # 짧은 영문 키는 단어 경계에서만 ("cu역삼점"은 허용, "cupang"은 거부)
+        return not _ASCII_LETTER.match(name[length])
+
+
+def match_rules(name: str) -> Optional[str]:
+    """키워드 규칙으로 카테고리 추정 (정규화된 이름 기준)"""
+    for category, keywords in KEYWORD_RULES:
+        for keyword in keywords:
+            if keyword in name:
+                return category
+    return None
+
+
+def build_llm_prompt(merchants: List[str]) -> str:
+    merchant_list = "\n".join(f"- {merchant}" for merchant in merchants)
+    return f"""다음은 카드 거래내역의 가맹점명입니다. 각 가맹점의 소비 카테고리를 골라주세요.
+
+카테고리: {", ".join(CATEGORIES)}
+
+가맹점:
+{merchant_list}
+
+JSON 객체 하나로만 응답하세요. 키는 가맹점명 그대로, 값은 위 카테고리 중 하나입니다.
+판단할 수 없으면 "{UNKNOWN_CATEGORY}"로 답하세요.
+```json
+{{"가맹점명": "카테고리"}}
+```
+"""
+
+
+def parse_llm_response(response: str) -> Dict[str, str]:
+    """LLM 응답에서 {정규화된 가맹점명: 카테고리} 추출 (형식이 틀리면 빈 dict)"""
+    start, end = response.find("{"), response.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = json.loads(response[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    # 키 표기가 조금 달라도 맞출 수 있도록 정규화된 이름으로 저장
+    return {normalize_merchant(str(k)): v for k, v in data.items() if v in CATEGORIES}
+
+
+class MerchantCategorizer:
+    """
+    거래내역 일괄 분류기 (프로세스 공용, 상태는 사전과 캐시뿐)
+
+    LLM이 판단한 결과는 정규화된 이름으로 공유 캐시(워커 간 공유)와
+    프로세스 내 LRU에 저장되어 같은 가맹점을 다시 묻지 않는다.
+    """
+
+    def __init__(self, index: Optional[MerchantIndex] = None, cache: Optional[SharedCache] = None,
+                 batch_size: Optional[int] = None, max_llm_merchants: Optional[int] = None,
+                 max_memo: int = 50000):
+        self.index = index or MerchantIndex()
+        self.cache = cache if cache is not None else get_cache("merchant_categories")
+        self.batch_size = batch_size or int(os.getenv("MERCHANT_LLM_BATCH_SIZE", "50"))
+        self.max_llm_merchants = (
+            max_llm_merchants if max_llm_merchants is not None
+            else int(os.getenv("MERCHANT_LLM_MAX_PER_REQUEST", "200"))
+        )
+        self.max_memo = max_memo
+        self._memo: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _local(self, name: str) -> Optional[str]:
+        """사전 → 규칙 (LLM/캐시 없이 판단 가능한 경우)"""
+        return self.index.lookup(name) or match_rules(name)
+
+    def _remembered(self, name: str) -> Optional[str]:
+        with self._lock:
+            category = self._memo.get(name)
+            if category is not None:
+                self._memo.move_to_end(name)
+                return category
+
+        category = self.cache.get(name)
+        if category is not None:
+            self._memoize(name, category)
+        return category
+
+    def _memoize(self, name: str, category: str):
+        with self._lock:
+            self._memo[name] = category
+            self._memo.move_to_end(name)
+            while len(self._memo) > self.max_memo:
+                self._memo.popitem(last=False)
+
+    def learn(self, merchant: str, category: str):
+        """LLM(또는 사용자)이 정한 카테고리 저장"""
+        name = normalize_merchant(merchant)
+        if name and category in CATEGORIES:
+            self.cache.set(name, category)
+            self._memoize(name, category)
+
+    def categorize(self, merchant: str) -> Optional[str]:
+        """가맹점 하나 (LLM은 쓰지 않음, 처음 보는 가맹점이면 None)"""
+        name = normalize_merchant(merchant)
+        if not name:
+            return UNKNOWN_CATEGORY
+        return self._local(name) or self._remembered(name)
+
+    def categorize_many(self, merchants: Iterable[str],
+                        llm: Optional[Callable[[str], Optional[str]]] = None) -> Dict[str, str]:
+        """
+        가맹점명 → 카테고리 (고유 가맹점 단위)
+
+        Args:
+            merchants: 원문 가맹점명
+            llm: 프롬프트 → 응답 함수. 처음 보는 가맹점만 batch_size개씩 묶어 호출하며,
+                 None을 반환하면(예산 소진 등) 남은 가맹점은 묻지 않는다.
+
+        Returns:
+            판단된 가맹점만 담은 dict. LLM이 답하지 않은 가맹점은 빠지며 캐시에도 남기지 않으므로
+            다음 요청에서 다시 물어본다.
+        """
+        result: Dict[str, str] = {}
+        unknown: Dict[str, List[str]] = {}   # 정규화된 이름 → 원문들
+
+        for merchant in set(merchants):
+            name = normalize_merchant(merchant)
+            category = (self._local(name) or self._remembered(name)) if name else UNKNOWN_CATEGORY
+            if category is not None:
+                result[merchant] = category
+            else:
+                unknown.setdefault(name, []).append(merchant)
+
+        if unknown and llm is not None:
+            pending = list(unknown)[:self.max_llm_merchants]
+            for i in range(0, len(pending), self.batch_size):
+                batch = pending[i:i + self.batch_size]
+                # 정규화된 이름 대신 원문 하나를 보여줘야 LLM이 알아보기 쉽다
+                originals = {unknown[name][0]: name for name in batch}
+                response = llm(build_llm_prompt(list(originals)))
+                if response is None:
+                    break
+
+                # 응답이 잘렸거나 형식이 틀려 빠진 가맹점은 "기타"로 굳히지 않는다
+                answers = parse_llm_response(response)
+                for original, name in originals.items():
+                    category = answers.get(name)
+                    if category is None:
+                        continue
+                    self.learn(original, category)
+                    for merchant in unknown.pop(name):
+                        result[merchant] = category
+
+        return result
+
+    def categorize_transactions(self, transactions: List[Dict[str, Any]],
+                                llm: Optional[Callable[[str], Optional[str]]] = None
+                                ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        카테고리가 없거나 표준 카테고리가 아닌 거래에 카테고리를 채운 사본
+
+        이미 표준 카테고리가 붙은 거래는 그대로 둔다.
+        이번 요청에서 판단하지 못한 가맹점의 거래는 "기타"로 채운다.
+
+        Returns:
+            (거래 사본, 판단하지 못한 거래 수)
+        """
+        targets = [tx for tx in transactions if tx.get("category") not in CATEGORIES]
+        if not targets:
+            return transactions, 0
+
+        categories = self.categorize_many((str(tx.get("merchant") or "") for tx in targets), llm)
+        unresolved = 0
+        result = []
+        for tx in transactions:
+            if tx.get("category") not in CATEGORIES:
+                category = categories.get(str(tx.get("merchant") or ""))
+                if category is None:
+                    unresolved += 1
+                    category = UNKNOWN_CATEGORY
+                tx = {**tx, "category": category}
+            result.append(tx)
+        return result, unresolved
+
+
+_categorizer: Optional[MerchantCategorizer] = None
+_categorizer_lock = threading.Lock()
+
+
+def get_categorizer() -> MerchantCategorizer:
+    """프로세스 공용 분류기"""
+    global _categorizer
+    if _categorizer is None:
+        with _categorizer_lock:
+            if _categorizer is None:
+                _categorizer = MerchantCategorizer()
+    return _categorizer
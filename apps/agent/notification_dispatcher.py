@@ -0,0 +1,619 @@
+# apps/agent/notification_dispatcher.py
+"""
+알림 발송 디스패처
+채널별 어댑터(email/slack/kakao) + 레이트 리밋 + 아웃박스(멱등 키) + 재시도(백오프)
+월간 리포트처럼 수만 건이 한꺼번에 나가는 경우에도 처리량이 채널 한도에만 묶이도록 한다.
+"""
+from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email.message import EmailMessage
+from datetime import datetime, timezone
+import hashlib
+import json
+import os
+import random
+import re
+import smtplib
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from shared_cache import SharedStore, get_store
+
+
+class NotificationError(Exception):
+    """발송 실패 (permanent=True 이면 재시도하지 않음)"""
+
+    def __init__(self, message: str, permanent: bool = False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+@dataclass
+class Notification:
+    """아웃박스에 쌓이는 발송 단위"""
+    idempotency_key: str
+    user_id: str
+    channel: str
+    recipient: str
+    message: str
+    subject: str = "FinSight 알림"
+    attempts: int = 0
+
+
+# ===== 레이트 리밋 =====
+class RateLimiter:
+    """
+    SharedStore(SQLite)에 상태를 두는 토큰 버킷 (초당 rate개, 최대 burst개)
+
+    한 번에 capacity보다 많이 가져갈 수 없으므로 배치 크기는 capacity 이하로 맞춰야 한다.
+
+    AGENT_WORKERS > 1 이어도 모든 워커가 같은 버킷을 쓰므로 채널 한도가 워커 수만큼 늘어나지 않는다.
+    """
+
+    def __init__(self, store: SharedStore, name: str, rate: float, burst: Optional[float] = None):
+        self.store = store
+        self.name = name
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.store.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limit (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+    def _try_acquire(self, tokens: float) -> float:
+        """토큰을 가져가면 0, 부족하면 기다려야 할 시간(초)"""
+        conn = self.store._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_limit WHERE name = ?", (self.name,)
+            ).fetchone()
+            available = self.capacity
+            if row is not None:
+                available = min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+
+            wait = 0.0
+            if available >= tokens:
+                available -= tokens
+            else:
+                wait = (tokens - available) / self.rate
+
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (self.name, available, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def acquire(self, tokens: float = 1):
+        """토큰이 찰 때까지 대기"""
+        if tokens > self.capacity:
+            raise ValueError(f"cannot acquire {tokens} tokens (capacity {self.capacity})")
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+# ===== 채널 어댑터 =====
+class ChannelAdapter:
+    """채널 어댑터 기본 클래스"""
+
+    channel: str = ""
+    max_batch: int = 1
+
+    def is_configured(self) -> bool:
+        raise NotImplementedError
+
+    def send_batch(self, notifications: List[Notification]) -> List[Optional[str]]:
+        """
+        알림 묶음 발송
+
+        Returns:
+            알림별 에러 메시지 (성공이면 None)
+            묶음 전체가 실패하면 NotificationError를 던진다.
+        """
+        raise NotImplementedError
+
+
+class EmailAdapter(ChannelAdapter):
+    """SMTP 이메일 (연결 하나로 여러 통 발송)"""
+
+    channel = "email"
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None,
+                 username: Optional[str] = None, password: Optional[str] = None,
+                 sender: Optional[str] = None, use_tls: Optional[bool] = None):
+        self.host = host or os.getenv("SMTP_HOST")
+        self.port = port or int(os.getenv("SMTP_PORT", "587"))
+        self.username = username or os.getenv("SMTP_USER")
+        self.password = password or os.getenv("SMTP_PASSWORD")
+        self.sender = sender or os.getenv("SMTP_FROM", "noreply@finsight.local")
+        self.use_tls = use_tls if use_tls is not None else os.getenv("SMTP_TLS", "true").lower() == "true"
+        self.max_batch = int(os.getenv("SMTP_BATCH_SIZE", "50"))
+
+    def is_configured(self) -> bool:
+        return bool(self.host)
+
+    def send_batch(self, notifications: List[Notification]) -> List[Optional[str]]:
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+                if self.use_tls:
+                    smtp.starttls()
+                if self.username:
+                    smtp.login(self.username, self.password or "")
+
+                errors: List[Optional[str]] = []
+                for n in notifications:
+                    msg = EmailMessage()
+                    msg["From"] = self.sender
+                    msg["To"] = n.recipient
+                    msg["Subject"] = n.subject
+                    msg.set_content(n.message)
+                    try:
+                        smtp.send_message(msg)
+                        errors.append(None)
+                    except smtplib.SMTPRecipientsRefused as e:
+                        errors.append(f"recipient refused: {e}")
+                    except smtplib.SMTPResponseException as e:
+                        errors.append(f"SMTP {e.smtp_code}: {e.smtp_error!r}")
+                    except (smtplib.SMTPServerDisconnected, OSError) as e:
+                        # 이미 보낸 메일은 성공 처리하고 나머지만 재시도
+                        errors.extend([f"SMTP disconnected: {e}"] * (len(notifications) - len(errors)))
+                        break
+                return errors
+
+        except (smtplib.SMTPException, OSError) as e:
+            raise NotificationError(f"SMTP failed: {e}")
+
+
+def _post_json(url: str, payload: Any, headers: Optional[Dict[str, str]] = None, timeout: float = 10):
+    """JSON POST (4xx는 재시도하지 않음)"""
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+        headers={"Content-Type": "application/json", **(headers or {})},
+        method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read()
+            return json.loads(body) if body.strip().startswith((b"{", b"[")) else None
+    except urllib.error.HTTPError as e:
+        permanent = 400 <= e.code < 500 and e.code != 429
+        raise NotificationError(f"HTTP {e.code}: {e.reason}", permanent=permanent)
+    except (urllib.error.URLError, OSError) as e:
+        raise NotificationError(f"HTTP request failed: {e}")
+
+
+class SlackAdapter(ChannelAdapter):
+    """Slack Incoming Webhook (웹훅은 메시지 단위 발송만 지원)"""
+
+    channel = "slack"
+    max_batch = 1
+
+    def __init__(self, webhook_url: Optional[str] = None):
+        self.webhook_url = webhook_url or os.getenv("SLACK_WEBHOOK_URL")
+
+    def is_configured(self) -> bool:
+        return bool(self.webhook_url)
+
+    def send_batch(self, notifications: List[Notification]) -> List[Optional[str]]:
+        errors: List[Optional[str]] = []
+        for n in notifications:
+            _post_json(self.webhook_url, {"text": n.message})
+            errors.append(None)
+        return errors
+
+
+class KakaoAdapter(ChannelAdapter):
+    """
+    카카오 알림톡 (대량 발송 API)
+
+    요청: {"messages": [{"key", "recipient", "message"}, ...]}
+    응답: {"results": [{"key", "status": "sent"|"failed", "error"}]} (생략 시 전체 성공)
+    """
+
+    channel = "kakao"
+
+    def __init__(self, api_url: Optional[str] = None, api_key: Optional[str] = None):
+        self.api_url = api_url or os.getenv("KAKAO_API_URL")
+        self.api_key = api_key or os.getenv("KAKAO_API_KEY")
+        self.max_batch = int(os.getenv("KAKAO_BATCH_SIZE", "100"))
+
+    def is_configured(self) -> bool:
+        return bool(self.api_url)
+
+    def send_batch(self, notifications: List[Notification]) -> List[Optional[str]]:
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        response = _post_json(self.api_url, {
+            "messages": [
+                {"key": n.idempotency_key, "recipient": n.recipient, "message": n.message}
+                for n in notifications
+            ]
+        }, headers=headers)
+
+        results = {r.get("key"): r for r in (response or {}).get("results", [])}
+        errors: List[Optional[str]] = []
+        for n in notifications:
+            result = results.get(n.idempotency_key)
+            if result and result.get("status") != "sent":
+                errors.append(result.get("error") or "failed")
+            else:
+                errors.append(None)
+        return errors
+
+
+# ===== 수신자 =====
+_EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+class RecipientDirectory:
+    """
+    사용자/채널 → 수신 주소 (서버 설정에서만 결정, LLM 출력은 쓰지 않음)
+
+    NOTIFY_RECIPIENTS_PATH JSON 파일: {"user_id": {"email": "...", "kakao": "010..."}}
+    - email: 설정이 없으면 user_id가 이메일 형식일 때 그대로 사용 (API는 OAuth 이메일을 user_id로 보냄)
+    - slack: 웹훅 URL이 채널 설정이므로 user_id를 그대로 사용
+    - kakao: 설정된 번호만 사용
+    """
+
+    def __init__(self, recipients: Optional[Dict[str, Dict[str, str]]] = None):
+        if recipients is None:
+            recipients = {}
+            path = os.getenv("NOTIFY_RECIPIENTS_PATH")
+            if path and os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    recipients = json.load(f)
+        self.recipients = recipients
+
+    def resolve(self, user_id: str, channel: str) -> Optional[str]:
+        configured = self.recipients.get(user_id, {}).get(channel)
+        if configured:
+            return configured
+        if channel == "email" and _EMAIL_PATTERN.match(user_id):
+            return user_id
+        if channel == "slack":
+            return user_id
+        return None
+
+
+# ===== 아웃박스 =====
+class Outbox:
+    """
+    SQLite 아웃박스
+
+    idempotency_key가 기본 키이므로 같은 알림을 여러 번 enqueue해도 한 번만 발송된다.
+    상태: pending → sending → sent | (pending 재시도) | dead
+    sending 상태는 lease 시간이 지나면 (워커가 죽은 것으로 보고) 다시 가져갈 수 있다.
+    """
+
+    LEASE_SECONDS = 300
+
+    def __init__(self, store: SharedStore):
+        self.store = store
+        self.store.execute("""
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                idempotency_key TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                recipient TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                message TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                sent_at TEXT
+            )
+        """)
+        self.store.execute(
+            "CREATE INDEX IF NOT EXISTS idx_outbox_due ON notification_outbox (channel, status, next_attempt_at)"
+        )
+
+    def enqueue(self, notification: Notification) -> bool:
+        """새로 추가되면 True, 이미 있는 키면 False"""
+        cursor = self.store.execute(
+            "INSERT OR IGNORE INTO notification_outbox "
+            "(idempotency_key, user_id, channel, recipient, subject, message, status, next_attempt_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, 'pending', ?)",
+            (notification.idempotency_key, notification.user_id, notification.channel,
+             notification.recipient, notification.subject, notification.message, time.time())
+        )
+        return cursor.rowcount == 1
+
+    def claim(self, channel: str, limit: int) -> List[Notification]:
+        """발송할 알림을 sending 상태로 가져감 (여러 워커가 동시에 가져가지 않도록)"""
+        now = time.time()
+        conn = self.store._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT idempotency_key, user_id, channel, recipient, message, subject, attempts "
+                "FROM notification_outbox WHERE status IN ('pending', 'sending') AND channel = ? "
+                "AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (channel, now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE notification_outbox SET status = 'sending', next_attempt_at = ? WHERE idempotency_key = ?",
+                [(now + self.LEASE_SECONDS, row[0]) for row in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return [Notification(*row) for row in rows]
+
+    def claim_key(self, key: str) -> Optional[Notification]:
+        """특정 알림 하나만 sending 상태로 가져감 (발송 대상이 아니면 None)"""
+        now = time.time()
+        cursor = self.store.execute(
+            "UPDATE notification_outbox SET status = 'sending', next_attempt_at = ? "
+            "WHERE idempotency_key = ? AND status IN ('pending', 'sending') AND next_attempt_at <= ?",
+            (now + self.LEASE_SECONDS, key, now)
+        )
+        if cursor.rowcount != 1:
+            return None
+
+        row = self.store.execute(
+            "SELECT idempotency_key, user_id, channel, recipient, message, subject, attempts "
+            "FROM notification_outbox WHERE idempotency_key = ?", (key,)
+        ).fetchone()
+        return Notification(*row)
+
+    def mark_sent(self, key: str):
+        self.store.execute(
+            "UPDATE notification_outbox SET status = 'sent', attempts = attempts + 1, last_error = NULL, "
+            "sent_at = ?, next_attempt_at = ? WHERE idempotency_key = ?",
+            (datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"), time.time(), key)
+        )
+
+    def mark_failed(self, key: str, error: str, next_attempt_at: Optional[float]):
+        """next_attempt_at이 None이면 더 이상 재시도하지 않음(dead)"""
+        status = "pending" if next_attempt_at is not None else "dead"
+        self.store.execute(
+            "UPDATE notification_outbox SET status = ?, attempts = attempts + 1, last_error = ?, "
+            "next_attempt_at = ? WHERE idempotency_key = ?",
+            (status, error, next_attempt_at or time.time(), key)
+        )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        cursor = self.store.execute(
+            "SELECT * FROM notification_outbox WHERE idempotency_key = ?", (key,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([c[0] for c in cursor.description], row))
+
+    def purge(self, older_than: float) -> int:
+        """
+        끝난 알림(sent/dead) 중 older_than초보다 오래된 행 삭제
+
+        마지막 상태 변경 시각(next_attempt_at) 기준이며, 삭제된 키는 다시 enqueue하면 새로 발송된다.
+        """
+        cursor = self.store.execute(
+            "DELETE FROM notification_outbox WHERE status IN ('sent', 'dead') AND next_attempt_at < ?",
+            (time.time() - older_than,)
+        )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        rows = self.store.execute(
+            "SELECT status, COUNT(*) FROM notification_outbox GROUP BY status"
+        ).fetchall()
+        return {status: count for status, count in rows}
+
+
+# ===== 디스패처 =====
+class NotificationDispatcher:
+    """아웃박스의 알림을 채널별로 병렬 발송"""
+
+    DEFAULT_RATES = {"email": 10.0, "slack": 1.0, "kakao": 20.0}
+
+    def __init__(self, adapters: Optional[List[ChannelAdapter]] = None, outbox: Optional[Outbox] = None,
+                 max_attempts: int = 5, backoff_base: float = 2.0, backoff_max: float = 600.0,
+                 retention: Optional[float] = None, recipients: Optional[RecipientDirectory] = None):
+        adapters = adapters if adapters is not None else [EmailAdapter(), SlackAdapter(), KakaoAdapter()]
+        self.adapters = {adapter.channel: adapter for adapter in adapters}
+        self.recipients = recipients or RecipientDirectory()
+        self.outbox = outbox or Outbox(get_store())
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # 끝난 알림을 아웃박스에 보관하는 기간 (초)
+        self.retention = retention if retention is not None else float(os.getenv("NOTIFY_OUTBOX_RETENTION", "604800"))
+
+        # 채널별 초당 발송 한도 (NOTIFY_RATE_EMAIL 등으로 조정, 모든 워커 합산)
+        self.limiters = {
+            channel: RateLimiter(
+                self.outbox.store, f"notify:{channel}",
+                float(os.getenv(f"NOTIFY_RATE_{channel.upper()}", rate))
+            )
+            for channel, rate in self.DEFAULT_RATES.items()
+            if channel in self.adapters
+        }
+
+        self._run_lock = threading.Lock()
+        self._run_thread: Optional[threading.Thread] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def make_key(user_id: str, channel: str, message: str, scope: str = "") -> str:
+        """
+        멱등 키
+
+        scope는 호출자가 정하는 발송 단위 (요청 ID, 리포트 월 등)로,
+        같은 scope 안에서만 같은 메시지를 한 번으로 합친다.
+        """
+        raw = f"{scope}|{user_id}|{channel}|{message}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def enqueue(self, user_id: str, channel: str, message: str, recipient: Optional[str] = None,
+                subject: str = "FinSight 알림", idempotency_key: Optional[str] = None,
+                scope: str = "") -> str:
+        """
+        알림을 아웃박스에 추가하고 멱등 키 반환
+
+        recipient는 서버 코드(배치 등)만 지정한다. 없으면 RecipientDirectory에서 찾고,
+        찾지 못하면 NotificationError(permanent).
+        """
+        if channel not in self.adapters:
+            raise ValueError(f"Unsupported channel: {channel}")
+
+        recipient = recipient or self.recipients.resolve(user_id, channel)
+        if not recipient:
+            raise NotificationError(f"No {channel} recipient configured for user {user_id}", permanent=True)
+
+        key = idempotency_key or self.make_key(user_id, channel, message, scope)
+        self.outbox.enqueue(Notification(
+            idempotency_key=key,
+            user_id=user_id,
+            channel=channel,
+            recipient=recipient,
+            message=message,
+            subject=subject
+        ))
+        return key
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempts))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _fail(self, notification: Notification, error: str, permanent: bool = False):
+        attempts = notification.attempts + 1
+        if permanent or attempts >= self.max_attempts:
+            print(f"❌ Notification dead ({notification.channel}, {notification.idempotency_key[:8]}): {error}")
+            self.outbox.mark_failed(notification.idempotency_key, error, None)
+        else:
+            self.outbox.mark_failed(notification.idempotency_key, error, time.time() + self._backoff(attempts))
+
+    def _batch_size(self, channel: str) -> int:
+        """한 번에 가져갈 알림 수 (레이트 리밋 버킷 크기를 넘지 않음)"""
+        size = self.adapters[channel].max_batch
+        limiter = self.limiters.get(channel)
+        if limiter:
+            size = min(size, max(1, int(limiter.capacity)))
+        return size
+
+    def _send(self, channel: str, batch: List[Notification], stats: Dict[str, int]):
+        """claim한 알림 묶음 발송 + 결과 기록"""
+        adapter = self.adapters[channel]
+        limiter = self.limiters.get(channel)
+
+        if not adapter.is_configured():
+            for n in batch:
+                self._fail(n, f"{channel} adapter not configured", permanent=True)
+            stats["failed"] += len(batch)
+            return
+
+        if limiter:
+            limiter.acquire(len(batch))
+
+        try:
+            errors = adapter.send_batch(batch)
+        except NotificationError as e:
+            for n in batch:
+                self._fail(n, str(e), permanent=e.permanent)
+            stats["failed"] += len(batch)
+            return
+
+        for n, error in zip(batch, errors):
+            if error is None:
+                self.outbox.mark_sent(n.idempotency_key)
+                stats["sent"] += 1
+            else:
+                self._fail(n, error)
+                stats["failed"] += 1
+
+    def send(self, key: str) -> Dict[str, int]:
+        """
+        아웃박스의 특정 알림 하나만 바로 발송 (Agent 요청 경로용)
+
+        다른 사용자의 대기 중인 알림은 건드리지 않는다. 이미 발송됐거나
+        재시도 대기 중이면 아무것도 하지 않는다.
+        """
+        stats = {"sent": 0, "failed": 0}
+        notification = self.outbox.claim_key(key)
+        if notification is not None:
+            self._send(notification.channel, [notification], stats)
+        return stats
+
+    def dispatch_channel(self, channel: str, max_batches: Optional[int] = None) -> Dict[str, int]:
+        """한 채널의 발송 가능한 알림을 배치 단위로 모두 발송"""
+        batch_size = self._batch_size(channel)
+        stats = {"sent": 0, "failed": 0}
+        batches = 0
+
+        while max_batches is None or batches < max_batches:
+            batch = self.outbox.claim(channel, batch_size)
+            if not batch:
+                break
+            batches += 1
+            self._send(channel, batch, stats)
+
+        return stats
+
+    def dispatch(self, channels: Optional[List[str]] = None) -> Dict[str, Dict[str, int]]:
+        """채널별로 병렬 발송 (처리량은 각 채널의 한도로만 제한됨)"""
+        channels = channels or list(self.adapters)
+        with ThreadPoolExecutor(max_workers=len(channels)) as executor:
+            futures = {channel: executor.submit(self.dispatch_channel, channel) for channel in channels}
+            result = {channel: future.result() for channel, future in futures.items()}
+
+        if self.retention:
+            self.outbox.purge(self.retention)
+        return result
+
+    def _run(self, channels: Optional[List[str]]):
+        started_at = time.time()
+        try:
+            result: Dict[str, Any] = {"dispatched": self.dispatch(channels)}
+        except Exception as e:
+            print(f"❌ Notification dispatch failed: {e}")
+            result = {"error": str(e)}
+        result.update(started_at=started_at, finished_at=time.time())
+        self.last_run = result
+
+    def start_dispatch(self, channels: Optional[List[str]] = None) -> bool:
+        """
+        백그라운드 스레드에서 dispatch() 시작 (이미 실행 중이면 False)
+
+        월간 대량 발송은 채널 한도 때문에 수십 분이 걸리므로 HTTP 요청 안에서 기다리지 않는다.
+        여러 워커가 동시에 돌아도 claim은 원자적이고 레이트 리밋은 공유되므로 한도를 넘지 않는다.
+        """
+        with self._run_lock:
+            if self.is_running:
+                return False
+            self._run_thread = threading.Thread(
+                target=self._run, args=(channels,), name="notification-dispatch", daemon=True
+            )
+            self._run_thread.start()
+            return True
+
+    @property
+    def is_running(self) -> bool:
+        return self._run_thread is not None and self._run_thread.is_alive()
+
+
+_dispatcher: Optional[NotificationDispatcher] = None
+
+
+def get_dispatcher() -> NotificationDispatcher:
+    """프로세스 공용 디스패처"""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = NotificationDispatcher()
+    return _dispatcher
@@ -0,0 +1,321 @@
+# apps/agent/report_renderer.py
+"""
+리포트 렌더링
+템플릿은 한 번만 로드/컴파일하여 재사용하고, 결과는 청크 단위로 스트리밍한다.
+월간 배치에서 수만 건을 렌더링하므로 리포트당 비용을 최소화하는 것이 목적.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from functools import lru_cache
+from html import escape
+from string import Formatter
+import os
+
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "report_templates")
+REPORT_TITLE = "소비 분석 리포트"
+SUPPORTED_FORMATS = ("html", "markdown", "pdf")
+
+# 차트에 표시할 최대 카테고리 수
+CHART_MAX_BARS = 10
+
+Chunk = Union[str, bytes]
+
+
+# ===== 템플릿 컴파일 =====
+class CompiledTemplate:
+    """
+    `{field}` 형식 템플릿을 (리터럴, 필드) 세그먼트로 미리 분해해 둔 템플릿
+
+    렌더링 시 파싱 없이 세그먼트를 순서대로 내보내기만 한다.
+    필드 값이 문자열이 아닌 iterable이면 그 청크들을 그대로 흘려보낸다.
+    """
+
+    def __init__(self, source: str):
+        self.segments: List[Tuple[str, Optional[str]]] = [
+            (literal, field) for literal, field, _, _ in Formatter().parse(source)
+        ]
+
+    def render(self, context: Dict[str, Any]) -> Iterator[str]:
+        for literal, field in self.segments:
+            if literal:
+                yield literal
+            if field is None:
+                continue
+
+            value = context[field]
+            if isinstance(value, str):
+                yield value
+            elif isinstance(value, Iterable):
+                yield from value
+            else:
+                yield str(value)
+
+
+@lru_cache(maxsize=None)
+def load_template(name: str) -> CompiledTemplate:
+    """템플릿 파일 로드 + 컴파일 (프로세스당 한 번)"""
+    with open(os.path.join(TEMPLATE_DIR, name), encoding="utf-8") as f:
+        return CompiledTemplate(f.read())
+
+
+# ===== 데이터 준비 =====
+def _sorted_categories(analysis: Dict[str, Any]) -> List[Tuple[str, int]]:
+    categories = analysis.get("categories", {}) or {}
+    return sorted(categories.items(), key=lambda item: item[1], reverse=True)
+
+
+def _md_cell(value: str) -> str:
+    return value.replace("|", "\\|")
+
+
+def _ratio(amount: int, total: int) -> float:
+    return amount / total * 100 if total else 0.0
+
+
+# ===== 차트 (서버 사이드) =====
+def render_svg_chart(categories: List[Tuple[str, int]], width: int = 480, bar_height: int = 22) -> Iterator[str]:
+    """카테고리별 금액 가로 막대 차트 (SVG)"""
+    bars = categories[:CHART_MAX_BARS]
+    if not bars:
+        return
+
+    max_amount = bars[0][1] or 1
+    label_width = 110
+    chart_width = width - label_width - 90
+    height = bar_height * len(bars) + 10
+
+    yield f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" font-size="12">'
+    for i, (category, amount) in enumerate(bars):
+        y = 5 + i * bar_height
+        bar_width = max(1, int(chart_width * amount / max_amount))
+        yield (
+            f'<text x="0" y="{y + 15}">{escape(category)}</text>'
+            f'<rect x="{label_width}" y="{y + 3}" width="{bar_width}" height="{bar_height - 6}" fill="#4e79a7"/>'
+            f'<text x="{label_width + bar_width + 6}" y="{y + 15}">{amount:,}원</text>'
+        )
+    yield "</svg>"
+
+
+def render_text_chart(categories: List[Tuple[str, int]], width: int = 30) -> Iterator[str]:
+    """카테고리별 금액 막대 차트 (텍스트)"""
+    bars = categories[:CHART_MAX_BARS]
+    if not bars:
+        return
+
+    max_amount = bars[0][1] or 1
+    label_width = max(len(category) for category, _ in bars)
+    for i, (category, amount) in enumerate(bars):
+        bar = "█" * max(1, round(width * amount / max_amount))
+        if i:
+            yield "\n"
+        yield f"{category.ljust(label_width)} {bar} {amount:,}원"
+
+
+# ===== 포맷별 렌더러 =====
+class HtmlReportRenderer:
+    template_name = "report.html"
+
+    def render(self, analysis: Dict[str, Any]) -> Iterator[str]:
+        categories = _sorted_categories(analysis)
+        context = {
+            "title": escape(REPORT_TITLE),
+            "total_amount": f"{analysis.get('total_amount', 0):,}",
+            "transaction_count": analysis.get("transaction_count", 0),
+            "chart": render_svg_chart(categories),
+            "category_items": (
+                f"        <li>{escape(category)}: {amount:,}원</li>\n"
+                for category, amount in categories
+            ),
+        }
+        return load_template(self.template_name).render(context)
+
+
+class MarkdownReportRenderer:
+    template_name = "report.md"
+
+    def render(self, analysis: Dict[str, Any]) -> Iterator[str]:
+        categories = _sorted_categories(analysis)
+        total = analysis.get("total_amount", 0)
+        context = {
+            "title": REPORT_TITLE,
+            "total_amount": f"{total:,}",
+            "transaction_count": analysis.get("transaction_count", 0),
+            "top_category": analysis.get("top_category") or "-",
+            "category_rows": "\n".join(
+                f"| {_md_cell(category)} | {amount:,}원 | {_ratio(amount, total):.1f}% |"
+                for category, amount in categories
+            ),
+            "chart": render_text_chart(categories),
+        }
+        return load_template(self.template_name).render(context)
+
+
+class PdfReportRenderer:
+    """
+    외부 라이브러리 없이 PDF를 직접 생성하는 렌더러
+
+    한글은 PDF 뷰어 내장 CJK 폰트(HYSMyeongJo-Medium, UniKS-UCS2-H)를 참조하여
+    폰트 임베딩 없이 출력한다. 객체를 쓰는 대로 바로 내보내고 xref 오프셋만 기록한다.
+    """
+
+    font_name = "HYSMyeongJo-Medium"
+    page_width = 595
+    page_height = 842
+    margin = 50
+    line_height = 20
+
+    @staticmethod
+    def _text(value: str) -> str:
+        """UCS-2 hex 문자열 (BMP 밖 문자는 제외)"""
+        return "<" + "".join(f"{ord(ch):04X}" for ch in value if ord(ch) <= 0xFFFF) + ">"
+
+    def _line(self, x: float, y: float, size: int, value: str) -> str:
+        return f"BT /F1 {size} Tf {x} {y} Td {self._text(value)} Tj ET\n"
+
+    def _pages(self, analysis: Dict[str, Any]) -> List[str]:
+        """페이지별 content stream 생성"""
+        categories = _sorted_categories(analysis)
+        total = analysis.get("total_amount", 0)
+
+        pages: List[str] = []
+        ops: List[str] = []
+        y = self.page_height - self.margin
+
+        def new_page():
+            nonlocal ops, y
+            pages.append("".join(ops))
+            ops = []
+            y = self.page_height - self.margin
+
+        ops.append(self._line(self.margin, y, 20, REPORT_TITLE))
+        y -= self.line_height * 2
+        ops.append(self._line(self.margin, y, 12, f"총 소비액: {total:,}원"))
+        y -= self.line_height
+        ops.append(self._line(self.margin, y, 12, f"거래 건수: {analysis.get('transaction_count', 0)}건"))
+        y -= self.line_height * 2
+
+        # 막대 차트
+        bars = categories[:CHART_MAX_BARS]
+        if bars:
+            ops.append(self._line(self.margin, y, 14, "카테고리별 소비"))
+            y -= self.line_height
+            max_amount = bars[0][1] or 1
+            chart_width = self.page_width - self.margin * 2 - 200
+            for category, amount in bars:
+                bar_width = max(1, int(chart_width * amount / max_amount))
+                ops.append(self._line(self.margin, y, 10, category))
+                ops.append(f"0.306 0.475 0.655 rg {self.margin + 100} {y - 2} {bar_width} 12 re f 0 g\n")
+                ops.append(self._line(self.margin + 106 + bar_width, y, 10, f"{amount:,}원"))
+                y -= self.line_height
+            y -= self.line_height
+
+        # 상세 표
+        for category, amount in categories:
+            if y < self.margin:
+                new_page()
+            ops.append(self._line(self.margin, y, 11, f"{category}: {amount:,}원 ({_ratio(amount, total):.1f}%)"))
+            y -= self.line_height
+
+        pages.append("".join(ops))
+        return pages
+
+    def render(self, analysis: Dict[str, Any]) -> Iterator[bytes]:
+        pages = self._pages(analysis)
+
+        # 객체 번호: 1 Catalog, 2 Pages, 3 Font, 4 CIDFont, 5 FontDescriptor, 6.. Page/Content 쌍
+        page_ids = [6 + i * 2 for i in range(len(pages))]
+        objects = [
+            "<< /Type /Catalog /Pages 2 0 R >>",
+            f"<< /Type /Pages /Kids [{' '.join(f'{pid} 0 R' for pid in page_ids)}] /Count {len(pages)} >>",
+            f"<< /Type /Font /Subtype /Type0 /BaseFont /{self.font_name} "
+            f"/Encoding /UniKS-UCS2-H /DescendantFonts [4 0 R] >>",
+            f"<< /Type /Font /Subtype /CIDFontType0 /BaseFont /{self.font_name} "
+            f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Korea1) /Supplement 1 >> "
+            f"/FontDescriptor 5 0 R /DW 1000 >>",
+            f"<< /Type /FontDescriptor /FontName /{self.font_name} /Flags 6 "
+            f"/FontBBox [0 -148 1001 880] /ItalicAngle 0 /Ascent 880 /Descent -148 "
+            f"/CapHeight 880 /StemV 59 >>",
+        ]
+        for pid, content in zip(page_ids, pages):
+            stream = content.encode("latin-1")
+            objects.append(
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.page_width} {self.page_height}] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {pid + 1} 0 R >>"
+            )
+            objects.append(stream)
+
+        offset = 0
+        offsets = []
+
+        def emit(chunk: bytes) -> bytes:
+            nonlocal offset
+            offset += len(chunk)
+            return chunk
+
+        yield emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        for number, body in enumerate(objects, start=1):
+            offsets.append(offset)
+            if isinstance(body, bytes):
+                yield emit(f"{number} 0 obj\n<< /Length {len(body)} >>\nstream\n".encode("latin-1"))
+                yield emit(body)
+                yield emit(b"\nendstream\nendobj\n")
+            else:
+                yield emit(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+
+        xref_offset = offset
+        xref = [f"xref\n0 {len(objects) + 1}\n", "0000000000 65535 f \n"]
+        xref.extend(f"{o:010d} 00000 n \n" for o in offsets)
+        yield "".join(xref).encode("latin-1")
+        yield (
+            f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n"
+        ).encode("latin-1")
+
+
+# ===== 진입점 =====
+class ReportRenderer:
+    """포맷(html|markdown|pdf)별 렌더러 디스패처"""
+
+    def __init__(self):
+        self.renderers = {
+            "html": HtmlReportRenderer(),
+            "markdown": MarkdownReportRenderer(),
+            "pdf": PdfReportRenderer(),
+        }
+
+    def render(self, analysis: Dict[str, Any], format: str = "html") -> Iterator[Chunk]:
+        """리포트를 청크 단위로 생성 (StreamingResponse 등에 그대로 사용 가능)"""
+        renderer = self.renderers.get(format)
+        if renderer is None:
+            raise ValueError(f"Unsupported report format: {format} (supported: {', '.join(SUPPORTED_FORMATS)})")
+        return renderer.render(analysis)
+
+    def render_to_string(self, analysis: Dict[str, Any], format: str = "html") -> str:
+        if format == "pdf":
+            raise ValueError("PDF is binary; use render_to_file() or render()")
+        return "".join(self.render(analysis, format))
+
+    def render_to_file(self, analysis: Dict[str, Any], path: str, format: str = "html") -> int:
+        """리포트를 파일로 스트리밍하고 기록한 바이트 수 반환"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        size = 0
+        with open(path, "wb") as f:
+            for chunk in self.render(analysis, format):
+                data = chunk if isinstance(chunk, bytes) else chunk.encode("utf-8")
+                f.write(data)
+                size += len(data)
+        return size
+
+
+_renderer: Optional[ReportRenderer] = None
+
+
+def get_renderer() -> ReportRenderer:
+    """프로세스 공용 ReportRenderer"""
+    global _renderer
+    if _renderer is None:
+        _renderer = ReportRenderer()
+    return _renderer
@@ -0,0 +1,211 @@
+# apps/agent/shared_cache.py
+"""
+멀티 워커 공유 캐시 / 메트릭
+uvicorn 워커 프로세스들이 SQLite(WAL) 파일 하나를 함께 사용하여
+LLM 응답, 워크플로우 계획 같은 캐시를 한 번만 데우고, 워커별 메트릭을 합산한다.
+"""
+from typing import Any, Callable, Dict, Optional
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "agent_cache.db")
+
+# 만료된 캐시 행 정리 주기 (초)
+PURGE_INTERVAL = float(os.getenv("AGENT_CACHE_PURGE_INTERVAL", "300"))
+
+
+class SharedStore:
+    """
+    SQLite WAL 기반 저장소
+
+    sqlite3 연결은 스레드 간 공유할 수 없으므로 스레드별로 연결을 만든다.
+    WAL 모드에서는 여러 프로세스가 동시에 읽고, 쓰기는 짧게 직렬화된다.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("AGENT_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self._local = threading.local()
+        self._last_purge = time.time()
+        self._purge_lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                PRIMARY KEY (namespace, key)
+            );
+            CREATE TABLE IF NOT EXISTS worker_metrics (
+                pid INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (pid, name)
+            );
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        return self._conn().execute(sql, params)
+
+    def purge_expired(self) -> int:
+        """모든 네임스페이스의 만료된 캐시 행 삭제"""
+        cursor = self.execute(
+            "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?",
+            (time.time(),)
+        )
+        return cursor.rowcount
+
+    def maybe_purge(self):
+        """
+        PURGE_INTERVAL마다 한 번 만료 행 정리
+
+        LLM 캐시 키는 이전 단계 결과를 포함해 다시 조회되는 일이 드물어서,
+        읽을 때만 지우면 파일이 계속 커진다. 쓰기 경로에서 주기적으로 정리한다.
+        """
+        now = time.time()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        with self._purge_lock:
+            if now - self._last_purge < PURGE_INTERVAL:
+                return
+            self._last_purge = now
+        self.purge_expired()
+
+
+class SharedCache:
+    """네임스페이스별 TTL 캐시 (모든 워커가 공유)"""
+
+    def __init__(self, store: SharedStore, namespace: str, ttl: Optional[float] = None):
+        self.store = store
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self.store.execute(
+            "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            self.delete(key)
+            return None
+
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.time() + ttl if ttl else None
+
+        self.store.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (self.namespace, key, json.dumps(value, ensure_ascii=False), expires_at)
+        )
+        self.store.maybe_purge()
+
+    def delete(self, key: str):
+        self.store.execute(
+            "DELETE FROM cache WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        )
+
+    def get_or_set(self, key: str, factory: Callable[[], Any]) -> Any:
+        """캐시에 없으면 factory()로 계산 후 저장"""
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def purge_expired(self) -> int:
+        cursor = self.store.execute(
+            "DELETE FROM cache WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at < ?",
+            (self.namespace, time.time())
+        )
+        return cursor.rowcount
+
+
+class WorkerMetrics:
+    """
+    워커(프로세스)별 카운터
+
+    각 워커는 자기 pid 행만 갱신하고, aggregate()는 모든 워커의 값을 합산한다.
+    """
+
+    def __init__(self, store: SharedStore):
+        self.store = store
+
+    def incr(self, name: str, value: float = 1):
+        self.store.execute(
+            "INSERT INTO worker_metrics (pid, name, value) VALUES (?, ?, ?) "
+            "ON CONFLICT(pid, name) DO UPDATE SET value = value + excluded.value",
+            (os.getpid(), name, value)
+        )
+
+    def worker(self, pid: Optional[int] = None) -> Dict[str, float]:
+        rows = self.store.execute(
+            "SELECT name, value FROM worker_metrics WHERE pid = ?",
+            (pid or os.getpid(),)
+        ).fetchall()
+        return {name: value for name, value in rows}
+
+    def aggregate(self) -> Dict[str, Any]:
+        rows = self.store.execute(
+            "SELECT pid, name, value FROM worker_metrics ORDER BY pid"
+        ).fetchall()
+
+        total: Dict[str, float] = {}
+        workers: Dict[str, Dict[str, float]] = {}
+        for pid, name, value in rows:
+            total[name] = total.get(name, 0) + value
+            workers.setdefault(str(pid), {})[name] = value
+
+        return {"total": total, "workers": workers}
+
+    def reset(self):
+        """서버 시작 시 이전 실행의 워커 메트릭 삭제"""
+        self.store.execute("DELETE FROM worker_metrics")
+
+
+# ===== 프로세스 단위 싱글톤 =====
+_store: Optional[SharedStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> SharedStore:
+    """현재 프로세스의 SharedStore 반환 (워커 fork 이후 첫 사용 시 생성)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SharedStore()
+    return _store
+
+
+def get_cache(namespace: str, ttl: Optional[float] = None) -> SharedCache:
+    return SharedCache(get_store(), namespace, ttl)
+
+
+def get_metrics() -> WorkerMetrics:
+    return WorkerMetrics(get_store())
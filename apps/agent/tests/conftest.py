@@ -0,0 +1,6 @@
+# apps/agent/tests/conftest.py
+# 모듈이 flat import(from shared_cache import ...)를 쓰므로 apps/agent를 import 경로에 추가
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
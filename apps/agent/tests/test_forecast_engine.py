@@ -0,0 +1,103 @@
+# apps/agent/tests/test_forecast_engine.py
+"""
+월말 지출 예측 엔진 테스트 (드문 카테고리, 읽기 전용 예측, 배치/증분 일치)
+"""
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from forecast_engine import ForecastEngine, forecast_transactions
+from shared_cache import SharedStore
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return ForecastEngine(SharedStore(str(tmp_path / "forecast.db")))
+
+
+def daily_rows(start: date, amounts, category: str):
+    return [
+        {"date": (start + timedelta(days=i)).isoformat(), "amount": amount, "category": category}
+        for i, amount in enumerate(amounts) if amount
+    ]
+
+
+# ===== 드문 카테고리 =====
+def test_single_transaction_is_not_extrapolated_as_daily_spend():
+    result = forecast_transactions([{"date": "2025-10-15", "amount": 10000, "category": "쇼핑"}])
+
+    # 1~14일은 지출 0으로 세므로 하루 10,000원으로 월말까지 늘려 잡지 않는다 (이전에는 약 29만원)
+    assert result["categories"]["쇼핑"]["month_end"] == 10000
+
+
+def test_sparse_category_shares_origin_with_other_categories():
+    result = forecast_transactions([
+        {"date": "2025-10-01", "merchant": "스타벅스", "amount": 4500, "category": "카페"},
+        {"date": "2025-10-05", "merchant": "쿠팡", "amount": 89000, "category": "온라인쇼핑"},
+        {"date": "2025-10-10", "merchant": "넷플릭스", "amount": 17000, "category": "구독"},
+    ])
+
+    # 월 1회 구독료가 당일 금액 × 남은 일수(약 37만원)로 부풀지 않는다
+    assert result["categories"]["구독"]["month_end"] == 17000
+
+
+def test_short_history_uses_run_rate_of_completed_days():
+    result = forecast_transactions([
+        {"date": "2025-10-01", "amount": 10000, "category": "식비"},
+        {"date": "2025-10-04", "amount": 10000, "category": "식비"},
+    ])
+
+    # 확정된 1~3일의 하루 평균(10,000 / 3) × 남은 27일, 진행 중인 4일은 하루치로 치지 않음
+    forecast = result["categories"]["식비"]
+    assert forecast["month_to_date"] == 20000
+    assert forecast["remaining"] == 90000
+
+
+def test_new_category_starts_at_users_origin(engine):
+    engine.update("user-1", daily_rows(date(2025, 10, 1), [5000] * 10, "식비"))
+    engine.update("user-1", [{"date": "2025-10-10", "amount": 30000, "category": "선물"}])
+
+    state = engine._load("user-1")["선물"]
+    assert state.origin == date(2025, 10, 1)
+    assert state.n_days == 9
+
+
+# ===== 읽기 전용 예측 =====
+def test_future_as_of_does_not_change_stored_state(engine):
+    rows = daily_rows(date(2025, 10, 1), [3000, 0, 7000, 2000, 0, 0, 9000, 4000, 1000], "카페")
+    engine.update("user-1", rows)
+    before = {cat: s.to_dict() for cat, s in engine._load("user-1").items()}
+
+    future = engine.forecast_month_end("user-1", as_of="2025-10-25")
+    engine.forecast_batch("2025-10-25")
+
+    after = {cat: s.to_dict() for cat, s in engine._load("user-1").items()}
+    assert after == before
+    assert future["as_of"] == "2025-10-25"
+    assert engine.forecast_month_end("user-1")["as_of"] == "2025-10-09"
+
+
+# ===== 배치/증분 일치 =====
+def test_fit_batch_matches_incremental_update(tmp_path):
+    rng = np.random.default_rng(0)
+    start = date(2025, 10, 1)
+    daily = rng.integers(0, 3, size=(3, 20)) * rng.integers(1000, 20000, size=(3, 20))
+    daily = daily.astype(float)
+    keys = [("user-1", "식비"), ("user-1", "카페"), ("user-2", "식비")]
+
+    batch = ForecastEngine(SharedStore(str(tmp_path / "batch.db")))
+    batch.fit_batch(keys, daily, start)
+
+    incremental = ForecastEngine(SharedStore(str(tmp_path / "incremental.db")))
+    for (user_id, category), amounts in zip(keys, daily):
+        # 첫 지출일이 달라도 시계열은 모두 1일에서 시작한다
+        incremental.update(user_id, daily_rows(start, amounts, category))
+
+    as_of = start + timedelta(days=20)
+    expected = batch.forecast_batch(as_of)
+    assert incremental.forecast_batch(as_of) == expected
+
+    for user_id, categories in expected.items():
+        single = batch.forecast_month_end(user_id, as_of)["categories"]
+        assert {cat: f["month_end"] for cat, f in single.items()} == pytest.approx(categories, abs=1)
@@ -0,0 +1,92 @@
+# apps/agent/tests/test_merchant_categorizer.py
+"""
+가맹점 분류기 테스트 (정규화, 짧은 영문 키 접두사 매칭, LLM 미응답 처리)
+"""
+from typing import List
+
+import pytest
+
+from ai_agent_system import AnalyzeSpendingTool
+from execution_context import ExecutionContext
+from merchant_categorizer import UNKNOWN_CATEGORY, MerchantCategorizer, normalize_merchant
+from shared_cache import SharedCache, SharedStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SharedStore(str(tmp_path / "categorizer.db"))
+
+
+@pytest.fixture
+def categorizer(store):
+    return MerchantCategorizer(cache=SharedCache(store, "merchant_categories"))
+
+
+class FakeLLM:
+    """고정 응답을 돌려주고 받은 프롬프트를 기록하는 Provider"""
+
+    def __init__(self, response: str):
+        self.response = response
+        self.prompts: List[str] = []
+
+    def get_name(self) -> str:
+        return "fake"
+
+    def analyze_with_usage(self, prompt: str, max_tokens: int = 4096, temperature: float = 0.7):
+        self.prompts.append(prompt)
+        return self.response, {"prompt_tokens": 0, "completion_tokens": 0}
+
+
+# ===== 정규화 / 사전 =====
+def test_pg_prefix_and_corporate_suffix_are_stripped(categorizer):
+    assert normalize_merchant("KCP-(주)무신사") == "무신사"
+    assert categorizer.categorize("KCP-(주)무신사") == "온라인쇼핑"
+
+
+def test_short_ascii_key_matches_at_word_boundary(categorizer):
+    assert categorizer.categorize("CU 역삼점") == "편의점"
+
+
+@pytest.mark.parametrize("merchant, wrong", [("cupang", "편의점"), ("KT&G", "통신")])
+def test_short_ascii_key_is_not_a_prefix_of_longer_word(categorizer, merchant, wrong):
+    assert categorizer.categorize(merchant) != wrong
+
+
+# ===== LLM 미응답 =====
+def test_unanswered_merchants_are_not_cached_or_resolved(categorizer):
+    merchants = ["동네빵집 본점", "낯선가게"]
+    # 응답이 잘려 한 곳만 답한 경우
+    result = categorizer.categorize_many(merchants, llm=lambda prompt: '{"동네빵집 본점": "식비"}')
+
+    assert result == {"동네빵집 본점": "식비"}
+    assert categorizer.cache.get(normalize_merchant("동네빵집 본점")) == "식비"
+    assert categorizer.cache.get(normalize_merchant("낯선가게")) is None
+    assert categorizer.categorize("낯선가게") is None
+
+
+def test_unresolved_transactions_are_counted(categorizer):
+    transactions = [
+        {"merchant": "스타벅스 강남점", "amount": 4500},
+        {"merchant": "낯선가게", "amount": 12000},
+    ]
+    result, unresolved = categorizer.categorize_transactions(transactions, llm=lambda prompt: None)
+
+    assert unresolved == 1
+    assert [tx["category"] for tx in result] == ["카페", UNKNOWN_CATEGORY]
+
+
+def test_aggregates_cache_is_skipped_when_merchants_are_unresolved(store, categorizer):
+    llm = FakeLLM("{}")
+    tool = AnalyzeSpendingTool(llm)
+    tool.categorizer = categorizer
+    aggregates = SharedCache(store, "aggregates")
+    ctx = ExecutionContext(user_id="user-1", caches={"aggregates": aggregates})
+    transactions = [{"date": "2025-10-01", "merchant": "낯선가게", "amount": 12000}]
+
+    first = tool.execute(ctx, transactions)
+    assert first["categories"] == {UNKNOWN_CATEGORY: 12000}
+    assert store.execute("SELECT COUNT(*) FROM cache WHERE namespace = 'aggregates'").fetchone()[0] == 0
+
+    # 캐시된 "기타" 결과 대신 다음 요청에서 다시 물어본다
+    tool.execute(ctx, transactions)
+    assert len(llm.prompts) == 2
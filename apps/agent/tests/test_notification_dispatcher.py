@@ -0,0 +1,328 @@
+# apps/agent/tests/test_notification_dispatcher.py
+"""
+알림 디스패처 테스트 (아웃박스 멱등성, 재시도/백오프, 레이트 리밋)
+카카오/슬랙은 로컬 HTTP 서버를 대역으로 사용한다.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import List, Optional
+
+import pytest
+
+from notification_dispatcher import (
+    ChannelAdapter,
+    KakaoAdapter,
+    Notification,
+    NotificationDispatcher,
+    NotificationError,
+    Outbox,
+    RateLimiter,
+    RecipientDirectory,
+    SlackAdapter,
+)
+from shared_cache import SharedStore
+
+
+class FakeAdapter(ChannelAdapter):
+    """보낸 알림을 기록하고, 지정한 횟수만큼 묶음 전체를 실패시키는 어댑터"""
+
+    channel = "email"
+
+    def __init__(self, max_batch: int = 50, failures: int = 0, permanent: bool = False):
+        self.max_batch = max_batch
+        self.failures = failures
+        self.permanent = permanent
+        self.batches: List[List[str]] = []
+
+    def is_configured(self) -> bool:
+        return True
+
+    def send_batch(self, notifications: List[Notification]) -> List[Optional[str]]:
+        if self.failures:
+            self.failures -= 1
+            raise NotificationError("temporary failure", permanent=self.permanent)
+        self.batches.append([n.idempotency_key for n in notifications])
+        return [None] * len(notifications)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """요청 본문을 server.requests에 쌓고 server.status로 응답"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append(json.loads(body))
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_stub():
+    server = HTTPServer(("127.0.0.1", 0), StubHandler)
+    server.requests = []
+    server.status = 200
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return Outbox(SharedStore(str(tmp_path / "outbox.db")))
+
+
+class AnyRecipient(RecipientDirectory):
+    """모든 사용자에게 테스트 주소를 돌려주는 디렉터리"""
+
+    def resolve(self, user_id: str, channel: str) -> Optional[str]:
+        return f"{user_id}@example.com"
+
+
+def make_dispatcher(outbox, adapter, **kwargs) -> NotificationDispatcher:
+    kwargs.setdefault("recipients", AnyRecipient({}))
+    return NotificationDispatcher(adapters=[adapter], outbox=outbox, **kwargs)
+
+
+# ===== 아웃박스 멱등성 =====
+def test_same_notification_in_same_scope_is_sent_once(outbox):
+    adapter = FakeAdapter()
+    dispatcher = make_dispatcher(outbox, adapter)
+
+    first = dispatcher.enqueue("user-1", "email", "10월 리포트", scope="req-1")
+    second = dispatcher.enqueue("user-1", "email", "10월 리포트", scope="req-1")
+
+    assert first == second
+    assert dispatcher.dispatch_channel("email") == {"sent": 1, "failed": 0}
+    assert dispatcher.dispatch_channel("email") == {"sent": 0, "failed": 0}
+
+
+def test_same_message_in_new_scope_is_sent_again(outbox):
+    adapter = FakeAdapter()
+    dispatcher = make_dispatcher(outbox, adapter)
+
+    dispatcher.enqueue("user-1", "email", "예산 80% 도달", scope="req-1")
+    dispatcher.dispatch_channel("email")
+    dispatcher.enqueue("user-1", "email", "예산 80% 도달", scope="req-2")
+
+    assert dispatcher.dispatch_channel("email") == {"sent": 1, "failed": 0}
+
+
+def test_send_only_delivers_the_given_key(outbox):
+    adapter = FakeAdapter()
+    dispatcher = make_dispatcher(outbox, adapter)
+
+    other = dispatcher.enqueue("user-2", "email", "다른 사용자 알림")
+    mine = dispatcher.enqueue("user-1", "email", "내 알림")
+
+    assert dispatcher.send(mine) == {"sent": 1, "failed": 0}
+    assert adapter.batches == [[mine]]
+    assert outbox.get(other)["status"] == "pending"
+    # 이미 발송된 알림은 다시 보내지 않음
+    assert dispatcher.send(mine) == {"sent": 0, "failed": 0}
+
+
+def test_purge_removes_finished_rows_only(outbox):
+    dispatcher = make_dispatcher(outbox, FakeAdapter())
+    sent = dispatcher.enqueue("user-1", "email", "보낸 알림")
+    dispatcher.send(sent)
+    pending = dispatcher.enqueue("user-1", "email", "대기 알림")
+
+    assert outbox.purge(older_than=-1) == 1
+    assert outbox.get(sent) is None
+    assert outbox.get(pending)["status"] == "pending"
+
+
+# ===== 수신자 =====
+def test_email_recipient_defaults_to_email_user_id():
+    directory = RecipientDirectory({})
+
+    assert directory.resolve("kim@example.com", "email") == "kim@example.com"
+    assert directory.resolve("user-1", "email") is None
+    assert directory.resolve("user-1", "kakao") is None
+
+
+def test_configured_recipient_wins():
+    directory = RecipientDirectory({"user-1": {"kakao": "01012345678", "email": "kim@example.com"}})
+
+    assert directory.resolve("user-1", "kakao") == "01012345678"
+    assert directory.resolve("user-1", "email") == "kim@example.com"
+
+
+def test_enqueue_without_recipient_is_permanent_error(outbox):
+    dispatcher = make_dispatcher(outbox, FakeAdapter(), recipients=RecipientDirectory({}))
+
+    with pytest.raises(NotificationError) as error:
+        dispatcher.enqueue("user-1", "email", "주소 없음")
+    assert error.value.permanent
+    assert outbox.counts() == {}
+
+
+def test_notification_tool_ignores_llm_recipient(outbox):
+    from ai_agent_system import SendNotificationTool
+    from execution_context import ExecutionContext
+
+    adapter = FakeAdapter()
+    dispatcher = make_dispatcher(outbox, adapter, recipients=RecipientDirectory({}))
+    tool = SendNotificationTool(dispatcher)
+    ctx = ExecutionContext(user_id="kim@example.com")
+
+    # LLM이 수신자를 넣어도 도구가 받지 않음
+    with pytest.raises(TypeError):
+        tool.execute(ctx, channel="email", message="요약", recipient="attacker@example.com")
+
+    result = tool.execute(ctx, channel="email", message="요약")
+    assert result["status"] == "sent"
+    assert outbox.get(result["idempotency_key"])["recipient"] == "kim@example.com"
+
+
+# ===== 재시도 / 백오프 =====
+def test_temporary_failure_is_retried_after_backoff(outbox):
+    adapter = FakeAdapter(failures=1)
+    dispatcher = make_dispatcher(outbox, adapter, backoff_base=0.05, backoff_max=0.05)
+    key = dispatcher.enqueue("user-1", "email", "재시도 알림")
+
+    assert dispatcher.dispatch_channel("email") == {"sent": 0, "failed": 1}
+    entry = outbox.get(key)
+    assert entry["status"] == "pending"
+    assert entry["attempts"] == 1
+    assert entry["next_attempt_at"] > time.time() - 0.01
+
+    # 백오프가 끝나기 전에는 가져가지 않음
+    assert dispatcher.dispatch_channel("email") == {"sent": 0, "failed": 0}
+
+    time.sleep(0.06)
+    assert dispatcher.dispatch_channel("email") == {"sent": 1, "failed": 0}
+    assert outbox.get(key)["status"] == "sent"
+
+
+def test_backoff_grows_exponentially_up_to_max(outbox):
+    dispatcher = make_dispatcher(outbox, FakeAdapter(), backoff_base=1.0, backoff_max=10.0)
+
+    assert 1.0 <= dispatcher._backoff(1) <= 2.0
+    assert 4.0 <= dispatcher._backoff(3) <= 8.0
+    assert dispatcher._backoff(10) <= 10.0
+
+
+def test_gives_up_after_max_attempts(outbox):
+    adapter = FakeAdapter(failures=10)
+    dispatcher = make_dispatcher(outbox, adapter, max_attempts=2, backoff_base=0.0, backoff_max=0.0)
+    key = dispatcher.enqueue("user-1", "email", "계속 실패")
+
+    # 백오프가 0이면 한 번의 dispatch 안에서 바로 재시도된다
+    assert dispatcher.dispatch_channel("email") == {"sent": 0, "failed": 2}
+    assert outbox.get(key)["status"] == "dead"
+    assert outbox.get(key)["attempts"] == 2
+    assert adapter.failures == 8
+
+
+def test_http_4xx_is_permanent(outbox, http_stub):
+    http_stub.status = 400
+    adapter = SlackAdapter(webhook_url=f"http://127.0.0.1:{http_stub.server_port}/hook")
+    dispatcher = make_dispatcher(outbox, adapter)
+    key = dispatcher.enqueue("user-1", "slack", "잘못된 요청")
+
+    assert dispatcher.dispatch_channel("slack") == {"sent": 0, "failed": 1}
+    assert outbox.get(key)["status"] == "dead"
+
+
+def test_http_5xx_is_retried(outbox, http_stub):
+    http_stub.status = 503
+    adapter = SlackAdapter(webhook_url=f"http://127.0.0.1:{http_stub.server_port}/hook")
+    dispatcher = make_dispatcher(outbox, adapter)
+    key = dispatcher.enqueue("user-1", "slack", "서버 오류")
+
+    dispatcher.dispatch_channel("slack")
+    assert outbox.get(key)["status"] == "pending"
+
+
+def test_kakao_batches_through_http_stub(outbox, http_stub, monkeypatch):
+    monkeypatch.setenv("NOTIFY_RATE_KAKAO", "1000")
+    adapter = KakaoAdapter(api_url=f"http://127.0.0.1:{http_stub.server_port}/alimtalk/batch")
+    adapter.max_batch = 10
+    dispatcher = make_dispatcher(outbox, adapter)
+    for i in range(25):
+        dispatcher.enqueue(f"user-{i}", "kakao", "월간 리포트가 도착했어요")
+
+    assert dispatcher.dispatch_channel("kakao") == {"sent": 25, "failed": 0}
+    assert [len(r["messages"]) for r in http_stub.requests] == [10, 10, 5]
+
+
+# ===== 레이트 리밋 =====
+def test_rate_limiter_charges_full_batch(tmp_path):
+    limiter = RateLimiter(SharedStore(str(tmp_path / "rate.db")), "email", rate=100)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.acquire(100)
+    # 처음 100개는 버킷에서, 나머지 200개는 초당 100개로 채워짐
+    assert time.monotonic() - start >= 1.9
+
+
+def test_rate_limiter_rejects_more_than_capacity(tmp_path):
+    with pytest.raises(ValueError):
+        RateLimiter(SharedStore(str(tmp_path / "rate.db")), "email", rate=10).acquire(11)
+
+
+def test_rate_limiter_is_shared_across_workers(tmp_path):
+    # 워커 프로세스마다 limiter를 만들어도 같은 스토어면 한도는 합산된다
+    path = str(tmp_path / "rate.db")
+    limiters = [RateLimiter(SharedStore(path), "email", rate=50) for _ in range(3)]
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=lambda l=l: [l.acquire(25) for _ in range(2)]) for l in limiters]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 150개 중 처음 50개만 버킷에서, 나머지 100개는 초당 50개 → 최소 2초 (워커별 버킷이면 즉시)
+    assert time.monotonic() - start >= 1.8
+
+
+def test_batch_size_is_capped_by_rate_limit(outbox, monkeypatch):
+    monkeypatch.setenv("NOTIFY_RATE_EMAIL", "20")
+    adapter = FakeAdapter(max_batch=50)
+    dispatcher = make_dispatcher(outbox, adapter)
+    for i in range(50):
+        dispatcher.enqueue(f"user-{i}", "email", "대량 발송")
+
+    start = time.monotonic()
+    assert dispatcher.dispatch_channel("email") == {"sent": 50, "failed": 0}
+    elapsed = time.monotonic() - start
+
+    assert max(len(batch) for batch in adapter.batches) == 20
+    # 첫 20개 이후 30개는 초당 20개 → 최소 1.5초
+    assert elapsed >= 1.4
+
+
+# ===== 백그라운드 발송 =====
+def test_start_dispatch_runs_in_background_once(outbox):
+    adapter = FakeAdapter()
+    dispatcher = make_dispatcher(outbox, adapter)
+    for i in range(3):
+        dispatcher.enqueue(f"user-{i}", "email", "월간 리포트")
+
+    release = threading.Event()
+    original = dispatcher.dispatch
+
+    def slow_dispatch(channels=None):
+        release.wait(5)
+        return original(channels)
+
+    dispatcher.dispatch = slow_dispatch
+    assert dispatcher.start_dispatch() is True
+    # 실행 중에는 다시 시작하지 않는다
+    assert dispatcher.start_dispatch() is False
+    assert dispatcher.is_running
+
+    release.set()
+    dispatcher._run_thread.join(5)
+    assert not dispatcher.is_running
+    assert dispatcher.last_run["dispatched"]["email"] == {"sent": 3, "failed": 0}
+    assert outbox.counts().get("sent") == 3
@@ -0,0 +1,314 @@
+# apps/agent/tracing.py
+"""
+분산 트레이싱 (W3C Trace Context)
+Kotlin API(AgentClient)가 보낸 traceparent 헤더를 이어받아
+워크플로우 단계 / Tool / LLM 호출마다 span을 만들고, OTLP 콜렉터나 파일로 내보낸다.
+
+설정 (OpenTelemetry 표준 환경변수)
+    OTEL_TRACES_EXPORTER: none | otlp | file  (기본 none)
+    OTEL_EXPORTER_OTLP_ENDPOINT: OTLP/HTTP 콜렉터 주소 (기본 http://localhost:4318)
+    OTEL_SERVICE_NAME: 서비스 이름 (기본 finsight-agent)
+    TRACE_FILE_PATH: file 익스포터 출력 경로 (JSON Lines)
+"""
+from typing import Any, Dict, Iterator, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import json
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+import urllib.request
+
+
+_TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# 서버 span (미들웨어에서 설정, 엔드포인트에서 ExecutionContext로 넘김)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+
+@dataclass
+class SpanContext:
+    trace_id: str
+    span_id: str
+    sampled: bool = True
+
+    def to_traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    """traceparent 헤더 파싱 (형식이 틀리면 None → 새 trace 시작)"""
+    if not header:
+        return None
+
+    match = _TRACEPARENT_PATTERN.match(header.strip().lower())
+    if not match:
+        return None
+
+    trace_id, span_id, flags = match.groups()
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+
+    return SpanContext(trace_id, span_id, sampled=bool(int(flags, 16) & 0x01))
+
+
+@dataclass
+class Span:
+    name: str
+    context: SpanContext
+    parent_span_id: Optional[str] = None
+    kind: int = SPAN_KIND_INTERNAL
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status_error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status_error = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1_000_000
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(span: Span) -> Dict[str, Any]:
+    """OTLP/JSON span 표현"""
+    data = {
+        "traceId": span.context.trace_id,
+        "spanId": span.context.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns or span.start_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+        "status": {"code": 2, "message": span.status_error} if span.status_error else {"code": 1},
+    }
+    if span.parent_span_id:
+        data["parentSpanId"] = span.parent_span_id
+    return data
+
+
+# ===== 익스포터 =====
+class SpanExporter:
+    def export(self, spans: List[Span]):
+        raise NotImplementedError
+
+
+class FileSpanExporter(SpanExporter):
+    """span 하나당 JSON 한 줄"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans: List[Span]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                record = to_otlp(span)
+                record["durationMs"] = round(span.duration_ms, 3)
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class OTLPHttpSpanExporter(SpanExporter):
+    """OTLP/HTTP (JSON 인코딩) → 콜렉터 /v1/traces"""
+
+    def __init__(self, endpoint: str, service_name: str):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+
+    def export(self, spans: List[Span]):
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": self.service_name}}
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "finsight.agent"},
+                    "spans": [to_otlp(span) for span in spans]
+                }]
+            }]
+        }
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+
+class BatchSpanProcessor:
+    """
+    끝난 span을 큐에 모아 백그라운드 스레드에서 내보냄
+
+    요청 처리 경로에서는 큐에 넣기만 하므로 익스포트 지연이 응답 시간에 섞이지 않는다.
+    """
+
+    def __init__(self, exporter: SpanExporter, max_batch: int = 256, interval: float = 2.0,
+                 max_queue: int = 10000):
+        self.exporter = exporter
+        self.max_batch = max_batch
+        self.interval = interval
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def on_end(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass  # 콜렉터가 느리면 span을 버린다 (요청 처리를 막지 않음)
+
+    def _drain(self) -> List[Span]:
+        batch = []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        while True:
+            batch = self._drain()
+            if not batch:
+                return
+            try:
+                self.exporter.export(batch)
+            except Exception as e:
+                print(f"⚠️  Span export failed: {e}")
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+
+# ===== Tracer =====
+class Tracer:
+    def __init__(self, processor: Optional[BatchSpanProcessor] = None):
+        self.processor = processor
+
+    @property
+    def enabled(self) -> bool:
+        return self.processor is not None
+
+    def _new_span(self, name: str, parent: Optional[SpanContext], parent_span_id: Optional[str],
+                  kind: int, attributes: Optional[Dict[str, Any]]) -> Span:
+        trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        sampled = parent.sampled if parent else True
+        return Span(
+            name=name,
+            context=SpanContext(trace_id, secrets.token_hex(8), sampled),
+            parent_span_id=parent_span_id,
+            kind=kind,
+            attributes=dict(attributes or {})
+        )
+
+    def start_server_span(self, name: str, traceparent: Optional[str] = None,
+                          attributes: Optional[Dict[str, Any]] = None) -> Span:
+        """들어온 요청의 루트 span (traceparent가 있으면 그 trace를 이어감)"""
+        remote = parse_traceparent(traceparent)
+        return self._new_span(name, remote, remote.span_id if remote else None, SPAN_KIND_SERVER, attributes)
+
+    def end(self, span: Span):
+        span.end_ns = time.time_ns()
+        if self.processor and span.context.sampled:
+            self.processor.on_end(span)
+
+    @contextmanager
+    def span(self, name: str, ctx, kind: int = SPAN_KIND_INTERNAL,
+             attributes: Optional[Dict[str, Any]] = None) -> Iterator[Span]:
+        """
+        ctx.span을 부모로 하는 하위 span
+
+        블록 안에서는 ctx.span이 새 span으로 바뀌므로 그 안에서 만든 span은 자식이 된다.
+        """
+        parent: Optional[Span] = ctx.span if ctx is not None else None
+        span = self._new_span(
+            name,
+            parent.context if parent else None,
+            parent.context.span_id if parent else None,
+            kind,
+            attributes
+        )
+
+        if ctx is not None:
+            ctx.span = span
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            if ctx is not None:
+                ctx.span = parent
+            self.end(span)
+
+
+def set_current_span(span: Optional[Span]):
+    return _current_span.set(span)
+
+
+def reset_current_span(token):
+    _current_span.reset(token)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def _create_tracer() -> Tracer:
+    exporter_type = os.getenv("OTEL_TRACES_EXPORTER", "none").lower()
+    service_name = os.getenv("OTEL_SERVICE_NAME", "finsight-agent")
+
+    if exporter_type == "otlp":
+        endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+        print(f"🔭 Tracing: OTLP → {endpoint}")
+        return Tracer(BatchSpanProcessor(OTLPHttpSpanExporter(endpoint, service_name)))
+
+    if exporter_type == "file":
+        path = os.getenv("TRACE_FILE_PATH", os.path.join(".cache", "traces.jsonl"))
+        print(f"🔭 Tracing: file → {path}")
+        return Tracer(BatchSpanProcessor(FileSpanExporter(path)))
+
+    return Tracer()
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """프로세스 공용 Tracer (워커마다 익스포트 스레드 하나)"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = _create_tracer()
+    return _tracer
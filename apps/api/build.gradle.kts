@@ -13,6 +13,7 @@ dependencies {
     implementation(libs.spring.boot.starter.actuator)
     implementation(libs.jackson.module.kotlin)
     implementation(libs.bundles.oauth2)
+    implementation(libs.bundles.tracing)
 
     implementation(project(":libs:common-core"))
     implementation(project(":libs:common-domain"))
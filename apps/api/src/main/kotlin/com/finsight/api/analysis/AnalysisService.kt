@@ -4,6 +4,8 @@ import com.finsight.domain.analysis.AnalysisRequest
 import com.finsight.domain.analysis.AnalysisResult
 import com.finsight.domain.analysis.Transaction
 import com.finsight.infra.agent.AgentClient
+import io.micrometer.observation.Observation
+import io.micrometer.observation.ObservationRegistry
 import org.slf4j.LoggerFactory
 import org.springframework.stereotype.Service
 import java.time.LocalDate
@@ -12,6 +14,7 @@ import java.time.format.DateTimeFormatter
 @Service
 class AnalysisService(
     private val agentClient: AgentClient,
+    private val observationRegistry: ObservationRegistry,
 ) {
     private val logger = LoggerFactory.getLogger(javaClass)
 
@@ -30,7 +33,7 @@ class AnalysisService(
         )
 
         logger.info("Analyzing ${dummyTransactions.size} transactions for user $userId (simple)")
-        return agentClient.analyze(request)
+        return observeAgentCall("simple") { agentClient.analyze(request) }
     }
 
     /**
@@ -48,7 +51,7 @@ class AnalysisService(
         )
 
         logger.info("Analyzing ${dummyTransactions.size} transactions for user $userId (LLM)")
-        return agentClient.analyzeWithLlm(request)
+        return observeAgentCall("llm") { agentClient.analyzeWithLlm(request) }
     }
 
     /**
@@ -64,6 +67,15 @@ class AnalysisService(
         throw NotImplementedError("Real transaction analysis not implemented yet")
     }
 
+    /**
+     * Agent 호출 구간을 span으로 기록 (하위 RestTemplate span이 traceparent를 Agent로 전파)
+     */
+    private fun observeAgentCall(mode: String, call: () -> AnalysisResult): AnalysisResult {
+        return Observation.createNotStarted("analysis.agent", observationRegistry)
+            .lowCardinalityKeyValue("mode", mode)
+            .observe<AnalysisResult> { call() }!!
+    }
+
     private fun generateDummyTransactions(): List<Transaction> {
         return listOf(
             Transaction("1", "2025-10-01", 4500, "카페", "스타벅스", "아메리카노"),
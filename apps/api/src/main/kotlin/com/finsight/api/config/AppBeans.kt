@@ -6,6 +6,7 @@ import com.finsight.infra.agent.AgentClient
 import com.finsight.infra.codef.CodefClient
 import com.finsight.infra.forecast.ForecastClient
 import org.springframework.boot.autoconfigure.condition.ConditionalOnProperty
+import org.springframework.boot.web.client.RestTemplateBuilder
 import org.springframework.context.annotation.Bean
 import org.springframework.context.annotation.Configuration
 import org.springframework.http.converter.json.MappingJackson2HttpMessageConverter
@@ -63,8 +64,12 @@ class AppBeans {
     }
 
     @Bean
-    fun agentRestTemplate(agentObjectMapper: ObjectMapper): RestTemplate {
-        val restTemplate = RestTemplate()
+    fun agentRestTemplate(
+        agentObjectMapper: ObjectMapper,
+        restTemplateBuilder: RestTemplateBuilder,
+    ): RestTemplate {
+        // Boot가 구성한 빌더를 사용해야 관측(Observation)이 붙어 traceparent 헤더가 전파됨
+        val restTemplate = restTemplateBuilder.build()
 
         // Jackson 컨버터 교체
         val converter = MappingJackson2HttpMessageConverter(agentObjectMapper)